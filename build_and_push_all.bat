@@ -24,7 +24,7 @@ for %%S in (%SERVICES%) do (
     echo === Building and Pushing: %%S ===
     cd /d "%BASE_DIR%\%%S"
 
-    docker build -t %USERNAME%/%%S:latest .
+    docker build --build-context common="%BASE_DIR%\common" -t %USERNAME%/%%S:latest .
     if !ERRORLEVEL! NEQ 0 (
         echo ❌ Failed to build %%S. Skipping push.
     ) else (
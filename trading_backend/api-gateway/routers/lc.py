@@ -1,6 +1,8 @@
 # trading_backend/api-gateway/routers/lc.py
-from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Depends
-import os, shutil, httpx
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Depends, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+import os, json, shutil, httpx, asyncio, random
 from routers.auth import require_roles, UserRole
 
 router = APIRouter()
@@ -25,6 +27,17 @@ async def upload_document(lc_id: int, file: UploadFile = File(...)):
 # ==========================================================
 LOC_SERVICE_URL = "http://loc-service:8001"  # Internal Docker service name
 
+# Shared keep-alive client; no read timeout so long NDJSON exports can stream
+LOC_CLIENT = httpx.AsyncClient(base_url=LOC_SERVICE_URL, timeout=httpx.Timeout(10.0, read=None))
+# Seconds each /loc/events long-poll waits; an empty poll becomes a keepalive on the feed
+LOC_EVENT_POLL_WAIT = 25
+# Query params the event feeds pass through to loc-service
+LOC_EVENT_FILTERS = ("loc_id", "buyer_id", "seller_id", "commodity", "status")
+# Polls retried (jittered exponential backoff, seconds) while loc-service is unreachable or failing
+LOC_EVENT_RETRIES = 6
+LOC_EVENT_BACKOFF_MIN = 0.5
+LOC_EVENT_BACKOFF_MAX = 10.0
+
 @router.post("/apply")
 async def apply_for_loc(request: Request):
     """Forward LOC creation to LOC microservice"""
@@ -41,15 +54,127 @@ async def apply_for_loc(request: Request):
 
 
 @router.get("/")
-async def list_locs():
-    """Get all LOCs"""
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(f"{LOC_SERVICE_URL}/loc")
+async def list_locs(request: Request):
+    """List LOCs; filters, cursor and format=ndjson are passed through and the body is streamed back"""
+    req = LOC_CLIENT.build_request("GET", "/loc", params=request.query_params)
+    resp = await LOC_CLIENT.send(req, stream=True)
+    if resp.status_code != 200:
+        await resp.aread()
+        await resp.aclose()
+        raise HTTPException(status_code=resp.status_code, detail=resp.text)
+    headers = {}
+    if "x-next-cursor" in resp.headers:
+        headers["X-Next-Cursor"] = resp.headers["x-next-cursor"]
+    return StreamingResponse(
+        resp.aiter_bytes(),
+        media_type=resp.headers.get("content-type"),
+        headers=headers,
+        background=BackgroundTask(resp.aclose),
+    )
+
+
+# ==========================================================
+# LOC Event Feeds (SSE and WebSocket)
+# ==========================================================
+async def poll_events(filters: dict, after):
+    """One page of loc-service events after ``after``; with no offset, just the head to tail from"""
+    params = dict(filters)
+    if after is not None:
+        params.update(after=after, wait=LOC_EVENT_POLL_WAIT)
+    resp = await LOC_CLIENT.get("/loc/events", params=params)
     if resp.status_code != 200:
         raise HTTPException(status_code=resp.status_code, detail=resp.text)
     return resp.json()
 
 
+async def poll_events_retrying(filters: dict, after):
+    """``poll_events``, retrying transport errors and 5xx replies before giving up with a 502"""
+    for attempt in range(LOC_EVENT_RETRIES):
+        try:
+            return await poll_events(filters, after)
+        except httpx.HTTPError as e:
+            error = str(e) or type(e).__name__
+        except HTTPException as e:
+            if e.status_code < 500:
+                raise
+            error = e.detail
+        await asyncio.sleep(random.uniform(0, min(LOC_EVENT_BACKOFF_MAX, LOC_EVENT_BACKOFF_MIN * 2 ** attempt)))
+    raise HTTPException(status_code=502, detail=f"loc-service unavailable: {error}")
+
+
+def event_filters(params) -> dict:
+    return {name: params[name] for name in LOC_EVENT_FILTERS if name in params}
+
+
+@router.get("/events")
+async def loc_event_feed(request: Request):
+    """Server-sent LOC events matching the filters, from ``Last-Event-ID`` (or ``after``) or from now.
+
+    Each event's ``id`` is its offset, so a reconnecting EventSource resumes
+    where it left off. Keepalives carry the offset too, so a resume skips
+    events that were filtered out. ``event: reset`` means some events were
+    trimmed before they could be sent and the client should reload state.
+    ``event: error`` ends the stream once loc-service stays unreachable, or
+    right away for a bad offset or filter.
+    """
+    filters = event_filters(request.query_params)
+    after = request.headers.get("Last-Event-ID") or request.query_params.get("after")
+
+    async def feed(after):
+        # Headers go out now; a resume's first poll can wait LOC_EVENT_POLL_WAIT for an event
+        yield ": connected\n\n"
+        while True:
+            try:
+                page = await poll_events_retrying(filters, after)
+            except HTTPException as e:
+                yield f"event: error\ndata: {json.dumps({'status': e.status_code, 'detail': e.detail})}\n\n"
+                return
+            if page["reset"]:
+                yield "event: reset\ndata: {}\n\n"
+            for event in page["events"]:
+                yield f"id: {event['offset']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+            if not page["events"]:
+                yield f": keepalive\nid: {page['next']}\n\n"
+            if await request.is_disconnected():
+                return
+            after = page["next"]
+
+    return StreamingResponse(
+        feed(after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/events/ws")
+async def loc_event_socket(websocket: WebSocket):
+    """The same feed as JSON messages; pass ``after`` to resume from the last ``offset`` received.
+
+    Closes with 1008 for a bad offset or filter and 1011 once loc-service stays unreachable.
+    """
+    await websocket.accept()
+    filters = event_filters(websocket.query_params)
+    after = websocket.query_params.get("after")
+    try:
+        while True:
+            page = await poll_events_retrying(filters, after)
+            if page["reset"]:
+                await websocket.send_json({"type": "reset"})
+            for event in page["events"]:
+                await websocket.send_json(event)
+            if not page["events"]:
+                await websocket.send_json({"type": "keepalive", "next": page["next"]})
+            after = page["next"]
+    except WebSocketDisconnect:
+        pass
+    except HTTPException as e:
+        try:
+            await websocket.close(code=1008 if e.status_code < 500 else 1011, reason=str(e.detail)[:120])
+        except RuntimeError:
+            # The client went away while we were retrying
+            pass
+
+
 @router.get("/{loc_id}")
 async def get_loc(loc_id: int):
     """Get single LOC by ID"""
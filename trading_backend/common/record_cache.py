@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # the shared backend is optional
+    redis = None
+
+logger = logging.getLogger("record_cache")
+
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+# Set to share one cache between replicas, e.g. redis://redis:6379/0
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "")
+
+Record = Dict[str, Any]
+
+
+class LocalBackend:
+    """In-process LRU with a per-entry TTL."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Record]]" = OrderedDict()
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[Record]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Record) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "local", "size": len(self._entries), "max_entries": self.max_entries, "evictions": self.evictions}
+
+
+class RedisBackend:
+    """Shared backend; entries are JSON with a Redis TTL, and Redis' own eviction policy bounds the size."""
+
+    def __init__(self, url: str = CACHE_REDIS_URL, ttl: float = CACHE_TTL):
+        if redis is None:
+            raise RuntimeError("CACHE_REDIS_URL is set but the redis package is not installed")
+        self.client = redis.from_url(url)
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Optional[Record]:
+        raw = await self.client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Record) -> None:
+        await self.client.set(key, json.dumps(value), px=int(self.ttl * 1000))
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        if keys:
+            await self.client.delete(*keys)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis"}
+
+
+class ReadThroughCache:
+    """Read-through cache of JSON-able records keyed by id.
+
+    Misses call ``loader`` and cache what it returns (``None``, meaning not
+    found, is not cached). Writers call ``invalidate`` after committing. A
+    shared backend that errors is treated as a miss rather than failing the read.
+
+    A load can read a row just before a writer commits and finish after that
+    writer's ``invalidate``; its fill would then cache the old record until the
+    TTL. ``invalidate`` bumps a generation for keys with a load in flight, and a
+    load whose key was bumped returns its record without caching it. This
+    covers invalidations made by this process only.
+    """
+
+    def __init__(self, name: str, backend=None):
+        self.name = name
+        self.backend = backend or backend_from_env()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.skipped_fills = 0
+        # key -> [loads in flight, generation]; only keys being loaded are tracked
+        self._loading: Dict[str, List[int]] = {}
+
+    def _key(self, record_id: Any) -> str:
+        return f"{self.name}:{record_id}"
+
+    async def get(self, record_id: Any, loader: Callable[[], Awaitable[Optional[Record]]]) -> Optional[Record]:
+        key = self._key(record_id)
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Cache read failed for %s: %s", key, e)
+            value = None
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        loading = self._loading.setdefault(key, [0, 0])
+        loading[0] += 1
+        generation = loading[1]
+        try:
+            value = await loader()
+        finally:
+            loading[0] -= 1
+            if not loading[0]:
+                del self._loading[key]
+        if loading[1] != generation:
+            self.skipped_fills += 1
+        elif value is not None:
+            try:
+                await self.backend.set(key, value)
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Cache write failed for %s: %s", key, e)
+        return value
+
+    async def invalidate(self, *record_ids: Any) -> None:
+        for record_id in record_ids:
+            loading = self._loading.get(self._key(record_id))
+            if loading is not None:
+                loading[1] += 1
+        try:
+            await self.backend.delete(self._key(i) for i in record_ids)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Cache invalidation failed for %s: %s", self.name, e)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "errors": self.errors,
+            "skipped_fills": self.skipped_fills,
+            **self.backend.stats(),
+        }
+
+
+def backend_from_env():
+    return RedisBackend() if CACHE_REDIS_URL else LocalBackend()
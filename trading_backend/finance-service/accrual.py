@@ -0,0 +1,87 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+SIMPLE = "simple"
+COMPOUND = "compound"
+CONVENTIONS = (SIMPLE, COMPOUND)
+# Actual/365, as in the single-line /interest endpoint
+DAYS_PER_YEAR = 365.0
+
+
+def epoch(dt: datetime) -> float:
+    """Seconds since the epoch; naive datetimes are UTC, as ``created_at`` is stored."""
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+
+class Book:
+    """Credit lines as parallel columns, one row per line."""
+
+    def __init__(self, rows: Sequence[Sequence[Any]]):
+        # rows of (id, applicant, amount, interest_rate, repaid_amount, created_at)
+        ids, applicants, amount, rate, repaid, created = zip(*rows) if rows else ((),) * 6
+        self.ids = np.array(ids, dtype=np.int64)
+        self.applicants = list(applicants)
+        # None (never set) becomes NaN, then 0 for amounts
+        self.amount = np.nan_to_num(np.array(amount, dtype=np.float64))
+        self.rate = np.array(rate, dtype=np.float64)
+        self.repaid = np.nan_to_num(np.array(repaid, dtype=np.float64))
+        self.created = np.array(
+            [epoch(c) if c is not None else np.nan for c in created], dtype=np.float64
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def outstanding(self) -> np.ndarray:
+        return np.maximum(self.amount - self.repaid, 0.0)
+
+    def days_between(self, start: Optional[datetime], end: datetime) -> np.ndarray:
+        """Days each line accrues in ``[start, end]``, counting only from when it was opened."""
+        begin = self.created if start is None else np.fmax(self.created, epoch(start))
+        return np.maximum(epoch(end) - begin, 0.0) / 86400.0
+
+
+def accrue(
+    principal: np.ndarray,
+    rate_pct: np.ndarray,
+    days: np.ndarray,
+    convention: str = SIMPLE,
+    periods_per_year: int = 365,
+) -> np.ndarray:
+    """Interest on ``principal`` at ``rate_pct`` a year over ``days``; the arguments broadcast.
+
+    Pass per-line columns of shape ``(n, 1)`` and horizons of shape ``(1, k)``
+    for an ``(n, k)`` grid, or three ``(n,)`` columns for one horizon per line.
+    """
+    if convention not in CONVENTIONS:
+        raise ValueError(f"convention must be one of {', '.join(CONVENTIONS)}")
+    rate = rate_pct / 100.0
+    years = days / DAYS_PER_YEAR
+    if convention == SIMPLE:
+        interest = principal * rate * years
+    else:
+        # (1 + r/m)^(m*t) - 1 via log1p/expm1 to stay accurate for small rates and short horizons
+        interest = principal * np.expm1(periods_per_year * years * np.log1p(rate / periods_per_year))
+    return np.nan_to_num(interest)
+
+
+def columns(book: Book, days: np.ndarray, interest: np.ndarray, horizons: Optional[Sequence[int]]) -> Dict[str, Any]:
+    """Columnar payload: one list per field, interest keyed by horizon when there are several."""
+    out: Dict[str, Any] = {
+        "credit_id": book.ids.tolist(),
+        "applicant": book.applicants,
+        "outstanding": book.outstanding.tolist(),
+        "interest_rate": np.where(np.isnan(book.rate), None, book.rate).tolist(),
+    }
+    if horizons is None:
+        out["days"] = np.round(days, 4).tolist()
+        out["interest"] = np.round(interest, 6).tolist()
+        out["total_interest"] = float(interest.sum())
+    else:
+        out["horizons"] = list(horizons)
+        out["interest"] = {str(h): np.round(interest[:, i], 6).tolist() for i, h in enumerate(horizons)}
+        out["total_interest"] = {str(h): float(interest[:, i].sum()) for i, h in enumerate(horizons)}
+    return out
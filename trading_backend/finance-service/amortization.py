@@ -0,0 +1,160 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+ANNUITY = "annuity"
+BULLET = "bullet"
+EQUAL_PRINCIPAL = "equal_principal"
+METHODS = (ANNUITY, BULLET, EQUAL_PRINCIPAL)
+# Schedule rows, in the order of the middle axis of a schedule array
+COLUMNS = ("payment", "interest", "principal", "balance")
+
+# Memoized schedules, one per distinct (amount, interest_rate, terms, method, periods_per_year)
+SCHEDULE_CACHE_SIZE = int(os.getenv("SCHEDULE_CACHE_SIZE", "2048"))
+SCHEDULE_MAX_TERMS = int(os.getenv("SCHEDULE_MAX_TERMS", "600"))
+
+CSV_HEADER = "credit_id,period," + ",".join(COLUMNS) + "\n"
+# Row formats after the credit_id, which export_chunks prefixes per line
+CSV_ROW = "%d" + ",%.4f" * len(COLUMNS)
+NDJSON_ROW = '"period": %d, ' + ", ".join(f'"{c}": %.4f' for c in COLUMNS) + "}"
+
+
+def schedule_grid(amount: np.ndarray, rate_pct: np.ndarray, terms: int, method: str, periods_per_year: int = 12) -> np.ndarray:
+    """Schedules for ``n`` lines at once, shape ``(n, len(COLUMNS), terms)``.
+
+    Period ``k`` (1-based) is computed in closed form from the opening balance,
+    so there is no loop over periods.
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+    a = amount[:, None]
+    r = np.nan_to_num(rate_pct)[:, None] / 100.0 / periods_per_year
+    k = np.arange(1, terms + 1, dtype=np.float64)[None, :]
+    if method == ANNUITY:
+        growth = (1.0 + r) ** terms
+        with np.errstate(divide="ignore", invalid="ignore"):
+            payment = np.where(r > 0, a * r * growth / (growth - 1.0), a / terms)
+            # Balance after k payments: a(1+r)^k - payment * ((1+r)^k - 1) / r
+            grown = (1.0 + r) ** k
+            balance = np.where(r > 0, a * grown - payment * (grown - 1.0) / r, a - payment * k)
+        opening = np.concatenate([a, balance[:, :-1]], axis=1)
+        interest = opening * r
+        principal = payment - interest
+        payment = np.broadcast_to(payment, principal.shape)
+    elif method == EQUAL_PRINCIPAL:
+        principal = np.broadcast_to(a / terms, (len(amount), terms))
+        opening = a - (k - 1.0) * a / terms
+        interest = opening * r
+        payment = principal + interest
+        balance = opening - principal
+    else:
+        interest = np.broadcast_to(a * r, (len(amount), terms))
+        principal = np.zeros((len(amount), terms))
+        principal[:, -1] = amount
+        payment = interest + principal
+        balance = a - np.cumsum(principal, axis=1)
+    # Clamp the float residue left on the final balance
+    balance = np.where(np.abs(balance) < 1e-6, 0.0, balance)
+    return np.stack([payment, interest, principal, balance], axis=1)
+
+
+class ScheduleEngine:
+    """Schedules for many lines, memoized per distinct terms with LRU eviction.
+
+    Lines sharing an amount and rate share one cached schedule; the misses in
+    a batch are computed together in one ``schedule_grid`` call. Exports
+    call in from threadpool workers while handlers call in from the event
+    loop, so the LRU is only touched under ``_lock``.
+    """
+
+    def __init__(self, max_entries: int = SCHEDULE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[float, float, int, str, int], np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def schedules(self, amount: np.ndarray, rate_pct: np.ndarray, terms: int, method: str, periods_per_year: int = 12) -> np.ndarray:
+        out = np.empty((len(amount), len(COLUMNS), terms))
+        missing: Dict[Tuple[float, float], list] = {}
+        with self._lock:
+            for i, (a, r) in enumerate(zip(amount.tolist(), np.nan_to_num(rate_pct).tolist())):
+                key = (a, r, terms, method, periods_per_year)
+                cached = self._entries.get(key)
+                if cached is None:
+                    missing.setdefault((a, r), []).append(i)
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                out[i] = cached
+            self.misses += len(missing)
+        if missing:
+            pairs = list(missing)
+            # Computed outside the lock; another caller may fill the same keys meanwhile, which is harmless
+            grid = schedule_grid(
+                np.array([a for a, _ in pairs]), np.array([r for _, r in pairs]), terms, method, periods_per_year
+            )
+            with self._lock:
+                for (a, r), schedule, rows in zip(pairs, grid, missing.values()):
+                    out[rows] = schedule
+                    self._put((a, r, terms, method, periods_per_year), schedule)
+        return out
+
+    def _put(self, key, schedule: np.ndarray) -> None:
+        schedule = schedule.copy()
+        schedule.setflags(write=False)
+        self._entries[key] = schedule
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+            }
+
+
+def format_schedule(schedule: np.ndarray, fmt: str) -> List[str]:
+    """A schedule's rows as text, without the credit_id that each line prefixes."""
+    table = np.column_stack([np.arange(1, schedule.shape[1] + 1), schedule.T])
+    buf = io.StringIO()
+    np.savetxt(buf, table, fmt=CSV_ROW if fmt == "csv" else NDJSON_ROW)
+    return buf.getvalue().splitlines()
+
+
+def export_chunks(engine: ScheduleEngine, ids: np.ndarray, amount: np.ndarray, rate_pct: np.ndarray,
+                  terms: int, method: str, periods_per_year: int, fmt: str, chunk: int) -> Iterator[str]:
+    """CSV or NDJSON rows of ``(credit_id, period, ...)``, ``chunk`` lines per yielded string.
+
+    Formatting floats dominates the cost, so each distinct schedule is
+    formatted once and reused for every line that shares it.
+    """
+    if fmt == "csv":
+        yield CSV_HEADER
+    formatted: Dict[Tuple[float, float], List[str]] = {}
+    for start in range(0, len(ids), chunk):
+        end = start + chunk
+        schedules = engine.schedules(amount[start:end], rate_pct[start:end], terms, method, periods_per_year)
+        if len(formatted) > engine.max_entries:
+            formatted.clear()
+        parts = []
+        keys = zip(ids[start:end].tolist(), amount[start:end].tolist(), np.nan_to_num(rate_pct[start:end]).tolist())
+        for i, (credit_id, a, r) in enumerate(keys):
+            rows = formatted.get((a, r))
+            if rows is None:
+                rows = formatted[(a, r)] = format_schedule(schedules[i], fmt)
+            prefix = f"{credit_id}," if fmt == "csv" else f'{{"credit_id": {credit_id}, '
+            parts.append(prefix + ("\n" + prefix).join(rows) + "\n")
+        yield "".join(parts)
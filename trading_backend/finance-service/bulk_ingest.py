@@ -0,0 +1,68 @@
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ValidationError
+
+NDJSON = "ndjson"
+CSV = "csv"
+FORMATS = (NDJSON, CSV)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Lines of a streamed body, decoded as UTF-8, without holding more than one line in memory."""
+    pending = b""
+    async for data in chunks:
+        pending += data
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8", errors="replace").rstrip("\r")
+    if pending:
+        yield pending.decode("utf-8", errors="replace").rstrip("\r")
+
+
+def error_text(e: Exception) -> str:
+    if isinstance(e, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, err['loc'])) or 'row'}: {err['msg']}" for err in e.errors())
+    return str(e)
+
+
+class RowParser:
+    """Turns numbered NDJSON or CSV lines into validated ``model`` instances.
+
+    CSV input must start with a header row naming the fields.
+    """
+
+    def __init__(self, fmt: str, model: type):
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+        self.fmt = fmt
+        self.model = model
+        self.header: Optional[List[str]] = None
+
+    def wants_header(self) -> bool:
+        return self.fmt == CSV and self.header is None
+
+    def set_header(self, line: str) -> None:
+        self.header = [name.strip() for name in next(csv.reader([line]))]
+
+    def _record(self, line: str) -> Dict[str, Any]:
+        if self.fmt == NDJSON:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("expected a JSON object")
+            return record
+        values = next(csv.reader([line]))
+        if len(values) != len(self.header):
+            raise ValueError(f"expected {len(self.header)} columns, got {len(values)}")
+        return dict(zip(self.header, values))
+
+    def parse(self, rows: List[Tuple[int, str]]) -> Tuple[List[Tuple[int, BaseModel]], List[Dict[str, Any]]]:
+        """Validate a chunk; returns ``(row number, model)`` pairs and ``{"row", "error"}`` entries."""
+        valid, errors = [], []
+        for row, line in rows:
+            try:
+                valid.append((row, self.model.model_validate(self._record(line))))
+            except (ValueError, ValidationError) as e:
+                errors.append({"row": row, "error": error_text(e)})
+        return valid, errors
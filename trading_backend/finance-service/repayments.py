@@ -0,0 +1,110 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# How long the first queued repayment waits for others to join its flush, in seconds
+REPAY_FLUSH_WINDOW = float(os.getenv("REPAY_FLUSH_WINDOW", "0.05"))
+# A flush starts early once this many repayments are queued
+REPAY_FLUSH_MAX_ROWS = int(os.getenv("REPAY_FLUSH_MAX_ROWS", "5000"))
+
+APPLIED = "applied"
+DUPLICATE = "duplicate"
+NOT_FOUND = "not_found"
+
+
+class Repay(NamedTuple):
+    credit_id: int
+    amount: float
+    idempotency_key: Optional[str] = None
+
+
+def coalesce(items: List[Repay], seen_keys) -> Tuple[Dict[int, float], List[str]]:
+    """Total amount per credit line, and each item's outcome so far.
+
+    Items whose key is in ``seen_keys``, or repeats an earlier item's key in
+    this batch, are duplicates and don't count towards the totals.
+    """
+    totals: Dict[int, float] = {}
+    outcomes = []
+    keys = set(seen_keys)
+    for item in items:
+        if item.idempotency_key is not None:
+            if item.idempotency_key in keys:
+                outcomes.append(DUPLICATE)
+                continue
+            keys.add(item.idempotency_key)
+        totals[item.credit_id] = totals.get(item.credit_id, 0.0) + item.amount
+        outcomes.append(APPLIED)
+    return totals, outcomes
+
+
+class RepaymentBatcher:
+    """Queues repayments from any number of callers and applies them in shared flushes.
+
+    A flush starts ``window`` seconds after the first repayment is queued, or
+    as soon as ``max_rows`` are queued, and hands everything queued so far to
+    ``apply`` in one call, which returns one outcome per repayment. Flushes
+    run one at a time; repayments queued meanwhile wait for the next one.
+    """
+
+    def __init__(
+        self,
+        apply: Callable[[List[Repay]], Awaitable[List[str]]],
+        window: float = REPAY_FLUSH_WINDOW,
+        max_rows: int = REPAY_FLUSH_MAX_ROWS,
+    ):
+        self.apply = apply
+        self.window = window
+        self.max_rows = max_rows
+        self._pending: List[Tuple[List[Repay], asyncio.Future]] = []
+        self._queued = 0
+        self._full = asyncio.Event()
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.flushes = 0
+        self.rows = 0
+
+    async def submit(self, items: List[Repay]) -> List[str]:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((items, future))
+        self._queued += len(items)
+        if self._queued >= self.max_rows:
+            self._full.set()
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_soon())
+        return await future
+
+    async def _flush_soon(self) -> None:
+        try:
+            await asyncio.wait_for(self._full.wait(), self.window)
+        except asyncio.TimeoutError:
+            pass
+        async with self._lock:
+            batch, self._pending = self._pending, []
+            self._queued = 0
+            self._full.clear()
+            self._timer = None
+            items = [item for chunk, _ in batch for item in chunk]
+            try:
+                outcomes = await self.apply(items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            self.flushes += 1
+            self.rows += len(items)
+            start = 0
+            for chunk, future in batch:
+                if not future.done():
+                    future.set_result(outcomes[start:start + len(chunk)])
+                start += len(chunk)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "flushes": self.flushes,
+            "rows": self.rows,
+            "rows_per_flush": round(self.rows / self.flushes, 1) if self.flushes else None,
+            "window": self.window,
+            "max_rows": self.max_rows,
+        }
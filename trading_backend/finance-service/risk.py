@@ -0,0 +1,177 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+import numpy as np
+
+from accrual import Book, epoch
+
+# Books at least this large are scored across a process pool, in chunks of RISK_POOL_CHUNK lines
+RISK_POOL_MIN_LINES = int(os.getenv("RISK_POOL_MIN_LINES", "500000"))
+RISK_POOL_CHUNK = int(os.getenv("RISK_POOL_CHUNK", "100000"))
+RISK_POOL_WORKERS = int(os.getenv("RISK_POOL_WORKERS", "0")) or None
+# Seconds between full rescoring, which also ages every line
+RISK_REBUILD_INTERVAL = float(os.getenv("RISK_REBUILD_INTERVAL", "3600"))
+
+# Logistic weights; the score is 1 / (1 + exp(-z)) with
+# z = BIAS + UTILIZATION * outstanding/amount + RATE * rate/100
+#     + NEW_LINE * exp(-age_days / NEW_LINE_DAYS) + EXPOSURE * log10(1 + applicant outstanding / EXPOSURE_SCALE)
+RISK_BIAS = -3.0
+RISK_UTILIZATION_WEIGHT = 2.5
+RISK_RATE_WEIGHT = 8.0
+RISK_NEW_LINE_WEIGHT = 0.75
+RISK_NEW_LINE_DAYS = 90.0
+RISK_EXPOSURE_WEIGHT = 0.8
+RISK_EXPOSURE_SCALE = 100_000.0
+
+
+def score_lines(amount: np.ndarray, repaid: np.ndarray, rate_pct: np.ndarray, age_days: np.ndarray, exposure: np.ndarray) -> np.ndarray:
+    """Risk scores in (0, 1), higher is riskier, for parallel per-line columns.
+
+    ``exposure`` is the applicant's outstanding total across all of their
+    lines, repeated for each line. Top-level so process-pool workers can run it.
+    """
+    outstanding = np.maximum(amount - repaid, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        utilization = np.where(amount > 0, outstanding / amount, 0.0)
+    z = (
+        RISK_BIAS
+        + RISK_UTILIZATION_WEIGHT * utilization
+        + RISK_RATE_WEIGHT * np.nan_to_num(rate_pct) / 100.0
+        + RISK_NEW_LINE_WEIGHT * np.exp(-np.nan_to_num(np.maximum(age_days, 0.0)) / RISK_NEW_LINE_DAYS)
+        + RISK_EXPOSURE_WEIGHT * np.log10(1.0 + exposure / RISK_EXPOSURE_SCALE)
+    )
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+class RiskIndex:
+    """Current risk score per credit line, read in O(1).
+
+    ``rebuild`` scores the whole book in one vectorized pass (split over a
+    process pool for large books). ``upsert`` applies one line's change
+    after a repay or a new application and rescores only the lines of that
+    applicant, whose shared exposure it moved.
+    """
+
+    def __init__(self):
+        # id -> (applicant, amount, repaid, rate, created (epoch s))
+        self.lines: Dict[int, Tuple[str, float, float, float, float]] = {}
+        self.by_applicant: Dict[str, Set[int]] = {}
+        self.exposure: Dict[str, float] = {}
+        self.scores: Dict[int, float] = {}
+        self.rebuilt_at: Optional[float] = None
+        self.incremental = 0
+        # Upserts made while a rebuild is scoring its (older) snapshot; re-applied once it lands
+        self._during_rebuild: Optional[Dict[int, Dict[str, Any]]] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def get(self, credit_id: int) -> Optional[float]:
+        return self.scores.get(credit_id)
+
+    async def rebuild(self, load: Callable[[], Awaitable[Book]]) -> None:
+        """Load the book with ``load()`` and rescore it, then swap the new index in.
+
+        Upserts are captured from before the load starts, so changes committed
+        while the book is read or scored are re-applied on top of it.
+        """
+        self._during_rebuild = {}
+        try:
+            book = await load()
+            now = time.time()
+            lines, by_applicant, exposure, line_exposure = await asyncio.to_thread(self._index, book)
+            columns = (book.amount, book.repaid, book.rate, (now - book.created) / 86400.0, line_exposure)
+            if len(book) >= RISK_POOL_MIN_LINES:
+                scores = await self._score_in_pool(columns)
+            else:
+                scores = await asyncio.to_thread(score_lines, *columns)
+            self.lines, self.by_applicant, self.exposure = lines, by_applicant, exposure
+            self.scores = dict(zip(book.ids.tolist(), scores.tolist()))
+            self.rebuilt_at = now
+            replay = self._during_rebuild
+        finally:
+            # On failure the old index stays, and upserts already applied themselves to it
+            self._during_rebuild = None
+        for credit in replay.values():
+            self.upsert(credit)
+
+    @staticmethod
+    def _index(book: Book):
+        """Per-line rows, ids per applicant, and each applicant's outstanding total (also per line)."""
+        ids = book.ids.tolist()
+        applicants = [str(a) for a in book.applicants]
+        codes: Dict[str, int] = {}
+        inverse = np.fromiter((codes.setdefault(a, len(codes)) for a in applicants), dtype=np.intp, count=len(ids))
+        totals = np.bincount(inverse, weights=book.outstanding, minlength=len(codes))
+        order = np.argsort(inverse, kind="stable")
+        groups = np.split(book.ids[order], np.cumsum(np.bincount(inverse, minlength=len(codes)))[:-1])
+        lines = dict(zip(ids, zip(applicants, book.amount.tolist(), book.repaid.tolist(), book.rate.tolist(), book.created.tolist())))
+        by_applicant = {a: set(group.tolist()) for a, group in zip(codes, groups)}
+        exposure = dict(zip(codes, totals.tolist()))
+        return lines, by_applicant, exposure, totals[inverse]
+
+    async def _score_in_pool(self, columns) -> np.ndarray:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=RISK_POOL_WORKERS)
+        loop = asyncio.get_running_loop()
+        n = len(columns[0])
+        futures = [
+            loop.run_in_executor(self._pool, score_lines, *(col[start:start + RISK_POOL_CHUNK] for col in columns))
+            for start in range(0, n, RISK_POOL_CHUNK)
+        ]
+        return np.concatenate(await asyncio.gather(*futures)) if futures else np.empty(0)
+
+    def upsert(self, credit: Dict[str, Any]) -> float:
+        """Apply a new or changed line (a CreditLineOut dict) and rescore its applicant's lines."""
+        credit_id = credit["id"]
+        if self._during_rebuild is not None:
+            self._during_rebuild[credit_id] = credit
+        created = credit["created_at"]
+        if isinstance(created, str):
+            created = datetime.fromisoformat(created)
+        line = (
+            str(credit["applicant"]),
+            credit["amount"] or 0.0,
+            credit["repaid_amount"] or 0.0,
+            np.nan if credit["interest_rate"] is None else credit["interest_rate"],
+            epoch(created) if created is not None else np.nan,
+        )
+        old = self.lines.get(credit_id)
+        if old is not None:
+            self.exposure[old[0]] = self.exposure.get(old[0], 0.0) - max(old[1] - old[2], 0.0)
+            self.by_applicant.get(old[0], set()).discard(credit_id)
+            if old[0] != line[0]:
+                self._rescore(old[0])
+        self.lines[credit_id] = line
+        self.by_applicant.setdefault(line[0], set()).add(credit_id)
+        self.exposure[line[0]] = self.exposure.get(line[0], 0.0) + max(line[1] - line[2], 0.0)
+        self._rescore(line[0])
+        self.incremental += 1
+        return self.scores[credit_id]
+
+    def _rescore(self, applicant: str) -> None:
+        ids = list(self.by_applicant.get(applicant, ()))
+        if not ids:
+            self.by_applicant.pop(applicant, None)
+            self.exposure.pop(applicant, None)
+            return
+        columns = list(zip(*(self.lines[i] for i in ids)))
+        amount, repaid, rate, created = (np.array(col, dtype=np.float64) for col in columns[1:])
+        age_days = (time.time() - created) / 86400.0
+        exposure = np.full(len(ids), self.exposure[applicant])
+        self.scores.update(zip(ids, score_lines(amount, repaid, rate, age_days, exposure).tolist()))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "lines": len(self.scores),
+            "applicants": len(self.by_applicant),
+            "rebuilt_at": self.rebuilt_at,
+            "incremental_updates": self.incremental,
+        }
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
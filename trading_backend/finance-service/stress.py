@@ -0,0 +1,184 @@
+import asyncio
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Scenarios per chunk; each chunk is one vectorized pass that returns its losses, not its paths
+STRESS_CHUNK = int(os.getenv("STRESS_CHUNK", "50000"))
+# Runs with fewer scenarios are simulated chunk after chunk in one thread. Shipping losses back
+# from pool workers adds about 30% to a run's CPU time, which only pays off on 2+ cores once a
+# run takes long enough (~100 ms at 12 factors) for the latency to matter
+STRESS_POOL_MIN_SCENARIOS = int(os.getenv("STRESS_POOL_MIN_SCENARIOS", "200000"))
+STRESS_WORKERS = int(os.getenv("STRESS_WORKERS", "0")) or None
+# trade-exchange candles used to seed volatilities and correlations
+STRESS_VOL_INTERVAL = os.getenv("STRESS_VOL_INTERVAL", "1h")
+STRESS_HISTORY_BARS = int(os.getenv("STRESS_HISTORY_BARS", "500"))
+# Fewer returns than this and a commodity falls back to the defaults below
+STRESS_MIN_RETURNS = int(os.getenv("STRESS_MIN_RETURNS", "20"))
+STRESS_DEFAULT_VOL = float(os.getenv("STRESS_DEFAULT_VOL", "0.30"))
+STRESS_DEFAULT_CORRELATION = float(os.getenv("STRESS_DEFAULT_CORRELATION", "0.30"))
+# trade-exchange keeps no FX history, so the FX factor's annual vol is configured
+STRESS_FX_VOL = float(os.getenv("STRESS_FX_VOL", "0.08"))
+
+INTERVAL_SECONDS = {"1m": 60, "5m": 300, "1h": 3600, "1d": 86400}
+SECONDS_PER_YEAR = 365.0 * 86400
+FX = "fx"
+
+
+def estimate_factors(
+    history: Dict[str, Tuple[List[str], List[float]]], interval: str = STRESS_VOL_INTERVAL
+) -> Tuple[List[str], np.ndarray, np.ndarray, Dict[str, str]]:
+    """Annual vols and a correlation matrix for each commodity in ``history``, then FX.
+
+    ``history`` maps a commodity to its candle (timestamps, closes). Vols come
+    from log returns of the closes; correlations from returns over the bar
+    timestamps two commodities share. Thin history falls back to defaults,
+    and the matrix is projected to the nearest valid correlation matrix.
+    """
+    names = sorted(history)
+    annualize = math.sqrt(SECONDS_PER_YEAR / INTERVAL_SECONDS[interval])
+    returns: Dict[str, Dict[str, float]] = {}
+    vols, sources = [], {}
+    for name in names:
+        stamps, closes = history[name]
+        closes = np.asarray(closes, dtype=np.float64)
+        ok = closes > 0
+        r = np.diff(np.log(closes[ok])) if ok.sum() > 1 else np.empty(0)
+        if len(r) >= STRESS_MIN_RETURNS and r.std() > 0:
+            vols.append(r.std(ddof=1) * annualize)
+            returns[name] = dict(zip(np.asarray(stamps)[ok][1:].tolist(), r.tolist()))
+            sources[name] = "history"
+        else:
+            vols.append(STRESS_DEFAULT_VOL)
+            sources[name] = "default"
+    corr = np.full((len(names), len(names)), STRESS_DEFAULT_CORRELATION)
+    for i, a in enumerate(names):
+        for j in range(i + 1, len(names)):
+            b = names[j]
+            if a in returns and b in returns:
+                common = returns[a].keys() & returns[b].keys()
+                if len(common) >= STRESS_MIN_RETURNS:
+                    x = np.array([returns[a][t] for t in common])
+                    y = np.array([returns[b][t] for t in common])
+                    if x.std() > 0 and y.std() > 0:
+                        corr[i, j] = corr[j, i] = np.corrcoef(x, y)[0, 1]
+    np.fill_diagonal(corr, 1.0)
+    # FX is taken as uncorrelated with commodity prices
+    full = np.eye(len(names) + 1)
+    full[:-1, :-1] = nearest_correlation(corr)
+    sources[FX] = "configured"
+    return names + [FX], np.array(vols + [STRESS_FX_VOL]), full, sources
+
+
+def nearest_correlation(corr: np.ndarray) -> np.ndarray:
+    """Clip negative eigenvalues and rescale to a unit diagonal, so Cholesky succeeds."""
+    if len(corr) == 0:
+        return corr
+    values, vectors = np.linalg.eigh((corr + corr.T) / 2)
+    fixed = vectors @ np.diag(np.maximum(values, 1e-8)) @ vectors.T
+    d = np.sqrt(np.diag(fixed))
+    return fixed / np.outer(d, d)
+
+
+def simulate_chunk(
+    seed: np.random.SeedSequence, scenarios: int, chol: np.ndarray, vols: np.ndarray, years: float,
+    commodity_exposure: np.ndarray, credit_exposure: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Losses for one chunk of correlated lognormal scenarios, and each position group's share.
+
+    The last factor is FX (local to reporting currency); every other factor
+    is a commodity price. LoC exposure to commodity ``c`` is revalued at
+    ``price_ratio_c * fx_ratio``; credit-line balances, as local-currency
+    receivables, at ``fx_ratio``. Top-level so process-pool workers can run it.
+    """
+    rng = np.random.default_rng(seed)
+    z = rng.standard_normal((scenarios, len(vols))) @ chol.T
+    # Martingale drift so the expected ratio is 1 and losses come from volatility alone
+    ratios = np.exp(vols * math.sqrt(years) * z - 0.5 * vols ** 2 * years)
+    fx = ratios[:, -1:]
+    pnl = np.empty((scenarios, len(vols)))
+    pnl[:, :-1] = commodity_exposure * (ratios[:, :-1] * fx - 1.0)
+    pnl[:, -1] = credit_exposure * (fx[:, 0] - 1.0)
+    # Per-group losses go back as float32 to halve what crosses the process boundary
+    return -pnl.sum(axis=1), (-pnl).astype(np.float32)
+
+
+def simulate_chunks(chunks: List[tuple]) -> List[Tuple[np.ndarray, np.ndarray]]:
+    return [simulate_chunk(*args) for args in chunks]
+
+
+class StressEngine:
+    """Monte Carlo VaR / expected shortfall over the aggregated LoC and credit-line book.
+
+    Revaluation is linear in the factor ratios, so positions are first summed
+    per factor; a scenario then costs O(factors), not O(positions), and the
+    book's size only matters for that one vectorized aggregation. Scenarios
+    are generated in ``chunk``-sized pieces, in one thread for typical runs
+    and across a process pool from ``pool_min_scenarios`` up (given more
+    than one core to run it on). Chunk seeds
+    don't depend on where chunks run, so a seed gives the same result either way.
+    """
+
+    def __init__(
+        self,
+        chunk: int = STRESS_CHUNK,
+        workers: Optional[int] = STRESS_WORKERS,
+        pool_min_scenarios: int = STRESS_POOL_MIN_SCENARIOS,
+    ):
+        self.chunk = chunk
+        self.workers = workers
+        self.pool_min_scenarios = pool_min_scenarios
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def run(
+        self,
+        names: List[str],
+        vols: np.ndarray,
+        corr: np.ndarray,
+        commodity_exposure: Dict[str, float],
+        credit_exposure: float,
+        scenarios: int,
+        horizon_days: float,
+        confidence: float,
+        seed: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        chol = np.linalg.cholesky(corr)
+        exposure = np.array([commodity_exposure.get(name, 0.0) for name in names[:-1]])
+        years = horizon_days / 365.0
+        sizes = [min(self.chunk, scenarios - start) for start in range(0, scenarios, self.chunk)]
+        # Independent child streams per chunk, reproducible for a given seed
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        args = [(s, n, chol, vols, years, exposure, credit_exposure) for s, n in zip(seeds, sizes)]
+        if len(args) > 1 and scenarios >= self.pool_min_scenarios and (self.workers or os.cpu_count() or 1) > 1:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            loop = asyncio.get_running_loop()
+            results = await asyncio.gather(*(loop.run_in_executor(self._pool, simulate_chunk, *a) for a in args))
+        else:
+            results = await asyncio.to_thread(simulate_chunks, args)
+        losses = np.concatenate([r[0] for r in results])
+        by_factor = np.concatenate([r[1] for r in results])
+
+        var = float(np.quantile(losses, confidence))
+        tail = losses >= var
+        contributions = by_factor[tail].mean(axis=0) if tail.any() else np.zeros(len(names))
+        labels = [f"loc:{name}" for name in names[:-1]] + ["credit_lines"]
+        return {
+            "scenarios": scenarios,
+            "horizon_days": horizon_days,
+            "confidence": confidence,
+            "var": var,
+            "expected_shortfall": float(losses[tail].mean()) if tail.any() else var,
+            "mean_loss": float(losses.mean()),
+            "worst_loss": float(losses.max()),
+            # Average loss of each position group in the tail scenarios; sums to expected_shortfall
+            "es_contributions": dict(zip(labels, contributions.astype(np.float64).tolist())),
+        }
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Service modules import each other (and trading_backend/common) as top-level modules, as they do in the image
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [SERVICE_DIR, os.path.join(os.path.dirname(SERVICE_DIR), "common")]
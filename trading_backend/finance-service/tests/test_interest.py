@@ -0,0 +1,29 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import main
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'finance.db'}")
+    monkeypatch.setattr(main, "engine", engine)
+    monkeypatch.setattr(main, "SessionLocal", async_sessionmaker(engine, expire_on_commit=False))
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_line_interest_accrues_on_the_outstanding_balance(client):
+    credit_id = client.post("/credit-lines", json={"applicant": "acme", "amount": 1000, "interest_rate": 10}).json()["id"]
+
+    def interest():
+        return client.get(f"/credit-lines/{credit_id}/interest", params={"days": 30}).json()["interest"]
+
+    assert interest() == pytest.approx(1000 * 0.10 * 30 / 365)
+    assert client.post(f"/credit-lines/{credit_id}/repay", params={"amount": 110}).status_code == 200
+    assert interest() == pytest.approx(890 * 0.10 * 30 / 365)
+    portfolio = client.get("/credit-lines/interest", params={"days": 30, "ids": [credit_id]}).json()
+    assert interest() == pytest.approx(portfolio["total_interest"]["30"])
+    assert client.post(f"/credit-lines/{credit_id}/repay", params={"amount": 2000}).status_code == 200
+    assert interest() == 0
@@ -0,0 +1,206 @@
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Protocol, Tuple
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # only needed for LOC_EVENT_BROKER=redis
+    redis = None
+
+# memory | redis | stream-local (the Redis Streams broker on an in-process stand-in)
+LOC_EVENT_BROKER = os.getenv("LOC_EVENT_BROKER", "memory")
+LOC_EVENT_REDIS_URL = os.getenv("LOC_EVENT_REDIS_URL", "redis://redis:6379/0")
+LOC_EVENT_STREAM = os.getenv("LOC_EVENT_STREAM", "loc-events")
+# Events retained for resume; older offsets get a reset
+LOC_EVENT_RETENTION = int(os.getenv("LOC_EVENT_RETENTION", "100000"))
+
+Event = Dict[str, Any]
+# (offset, event), oldest first
+Entries = List[Tuple[str, Event]]
+
+
+def offset_key(offset: str) -> Tuple[int, int]:
+    """Order offsets of the ``"<ms>-<seq>"`` form both brokers use; ``"0"`` is before everything."""
+    ms, _, seq = offset.partition("-")
+    return int(ms), int(seq or 0)
+
+
+class EventBroker(Protocol):
+    async def publish(self, events: List[Event]) -> List[str]:
+        """Append events in order and return their offsets."""
+        ...
+
+    async def read(self, after: str, count: int, wait: float) -> Tuple[Entries, bool]:
+        """Up to ``count`` events after ``after``, waiting up to ``wait`` seconds for one.
+
+        The flag is True when events after ``after`` have already been
+        trimmed, so the reader has missed some and should re-sync.
+        """
+        ...
+
+    async def head(self) -> str:
+        """Offset of the newest event ("0" when empty); reading after it yields only new events."""
+        ...
+
+
+class MemoryBroker:
+    """Bounded in-process event log; readers block on a condition.
+
+    Offsets are ``"<boot>-<n>"``, where ``boot`` is the broker's start time in
+    ms, so an offset from before a restart is recognized (and reset) instead
+    of being read as a position in the new log.
+    """
+
+    def __init__(self, retention: int = LOC_EVENT_RETENTION):
+        self._log: Deque[Tuple[int, Event]] = deque(maxlen=retention)
+        self._boot = int(time.time() * 1000)
+        self._next = 1
+        self._changed = asyncio.Condition()
+
+    async def publish(self, events: List[Event]) -> List[str]:
+        offsets = []
+        for event in events:
+            self._log.append((self._next, event))
+            offsets.append(f"{self._boot}-{self._next}")
+            self._next += 1
+        if events:
+            async with self._changed:
+                self._changed.notify_all()
+        return offsets
+
+    async def read(self, after: str, count: int, wait: float) -> Tuple[Entries, bool]:
+        boot, after_n = offset_key(after)
+        reset = False
+        if (boot, after_n) != (0, 0) and (boot != self._boot or after_n >= self._next):
+            # From another boot of this broker (or never issued): start over from the oldest event
+            reset, after_n = True, 0
+        if after_n == self._next - 1 and wait > 0:
+            try:
+                async with self._changed:
+                    await asyncio.wait_for(self._changed.wait_for(lambda: self._next - 1 > after_n), wait)
+            except asyncio.TimeoutError:
+                pass
+        log = self._log
+        if not log or after_n >= log[-1][0]:
+            return [], reset
+        first = log[0][0]
+        # Reading from "0" asks for whatever is retained, so a trimmed start is not a gap
+        reset = reset or 0 < after_n < first - 1
+        start = max(after_n + 1 - first, 0)
+        entries = itertools.islice(log, start, start + count)
+        return [(f"{self._boot}-{offset}", event) for offset, event in entries], reset
+
+    async def head(self) -> str:
+        return f"{self._boot}-{self._next - 1}" if self._next > 1 else "0"
+
+
+class RedisStreamBroker:
+    """Events as entries of one Redis Stream (XADD with approximate MAXLEN, XREAD BLOCK to tail)."""
+
+    def __init__(self, client, stream: str = LOC_EVENT_STREAM, retention: int = LOC_EVENT_RETENTION):
+        self.client = client
+        self.stream = stream
+        self.retention = retention
+
+    async def publish(self, events: List[Event]) -> List[str]:
+        if len(events) > 1 and hasattr(self.client, "pipeline"):
+            # One round trip for a bulk transition's worth of events
+            pipe = self.client.pipeline(transaction=False)
+            for event in events:
+                pipe.xadd(self.stream, {"data": json.dumps(event)}, maxlen=self.retention, approximate=True)
+            return await pipe.execute()
+        return [
+            await self.client.xadd(self.stream, {"data": json.dumps(event)}, maxlen=self.retention, approximate=True)
+            for event in events
+        ]
+
+    async def read(self, after: str, count: int, wait: float) -> Tuple[Entries, bool]:
+        response = await self.client.xread({self.stream: after}, count=count, block=int(wait * 1000) or None)
+        entries = [(offset, json.loads(fields["data"])) for _, items in response or () for offset, fields in items]
+        reset = False
+        if entries and after != "0":
+            # Something after ``after`` was trimmed, not merely ``after`` itself
+            info = await self.client.xinfo_stream(self.stream)
+            trimmed = info.get("max-deleted-entry-id")
+            if trimmed is None:
+                # Before Redis 7 only the oldest survivor is known; assume a gap if it is past ``after``
+                oldest = await self.client.xrange(self.stream, "-", "+", count=1)
+                trimmed = oldest[0][0]
+            reset = offset_key(trimmed) > offset_key(after)
+        return entries, reset
+
+    async def head(self) -> str:
+        newest = await self.client.xrevrange(self.stream, "+", "-", count=1)
+        return newest[0][0] if newest else "0"
+
+
+class LocalStreamClient:
+    """In-process stand-in for the few ``redis.asyncio`` stream commands RedisStreamBroker uses.
+
+    Ids follow Redis' ``<ms>-<seq>`` format and MAXLEN trims exactly.
+    """
+
+    def __init__(self):
+        self._streams: Dict[str, Deque[Tuple[str, Dict[str, str]]]] = {}
+        self._last: Dict[str, Tuple[int, int]] = {}
+        self._deleted: Dict[str, str] = {}
+        self._changed = asyncio.Condition()
+
+    async def xadd(self, name: str, fields: Dict[str, str], maxlen: Optional[int] = None, approximate: bool = True) -> str:
+        ms = int(time.time() * 1000)
+        last_ms, last_seq = self._last.get(name, (0, -1))
+        seq = last_seq + 1 if ms <= last_ms else 0
+        ms = max(ms, last_ms)
+        self._last[name] = (ms, seq)
+        stream = self._streams.setdefault(name, deque())
+        entry_id = f"{ms}-{seq}"
+        stream.append((entry_id, dict(fields)))
+        while maxlen is not None and len(stream) > maxlen:
+            self._deleted[name] = stream.popleft()[0]
+        async with self._changed:
+            self._changed.notify_all()
+        return entry_id
+
+    def _after(self, name: str, after: str, count: Optional[int]):
+        key = offset_key(after)
+        out = [(i, f) for i, f in self._streams.get(name, ()) if offset_key(i) > key]
+        return out[:count] if count else out
+
+    async def xread(self, streams: Dict[str, str], count: Optional[int] = None, block: Optional[int] = None):
+        def ready():
+            return [[name, items] for name, after in streams.items() if (items := self._after(name, after, count))]
+
+        result = ready()
+        if not result and block:
+            try:
+                async with self._changed:
+                    await asyncio.wait_for(self._changed.wait_for(lambda: bool(ready())), block / 1000)
+            except asyncio.TimeoutError:
+                pass
+            result = ready()
+        return result
+
+    async def xrange(self, name: str, min: str = "-", max: str = "+", count: Optional[int] = None):
+        items = list(self._streams.get(name, ()))
+        return items[:count] if count else items
+
+    async def xinfo_stream(self, name: str) -> Dict[str, Any]:
+        return {"length": len(self._streams.get(name, ())), "max-deleted-entry-id": self._deleted.get(name, "0-0")}
+
+    async def xrevrange(self, name: str, max: str = "+", min: str = "-", count: Optional[int] = None):
+        items = list(reversed(self._streams.get(name, ())))
+        return items[:count] if count else items
+
+
+def broker_from_env() -> EventBroker:
+    if LOC_EVENT_BROKER == "redis":
+        if redis is None:
+            raise RuntimeError("LOC_EVENT_BROKER=redis requires the redis package")
+        return RedisStreamBroker(redis.from_url(LOC_EVENT_REDIS_URL, decode_responses=True))
+    if LOC_EVENT_BROKER == "stream-local":
+        return RedisStreamBroker(LocalStreamClient())
+    return MemoryBroker()
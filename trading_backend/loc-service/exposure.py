@@ -0,0 +1,110 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+# Columns LoC exposure is totalled by
+DIMENSIONS = ("buyer_id", "seller_id", "commodity")
+# Statuses that no longer count towards open exposure
+CLOSED_STATUSES = ("COMPLETED",)
+# Seconds between full rebuilds from the table, to fold in writes made by other replicas
+EXPOSURE_REBUILD_INTERVAL = float(os.getenv("EXPOSURE_REBUILD_INTERVAL", "300"))
+
+# (dimension, value, status, amount, count), as returned by a GROUP BY
+GroupRow = Tuple[str, Any, str, float, int]
+
+
+def _status(value: Any) -> str:
+    return getattr(value, "value", value)
+
+
+def _field(loc: Any, name: str) -> Any:
+    """Read from a row mapping or an ORM object alike."""
+    return loc[name] if isinstance(loc, Mapping) else getattr(loc, name)
+
+
+class ExposureIndex:
+    """Running amount and count per (dimension value, status) for each of ``DIMENSIONS``.
+
+    Creates call ``add`` and transitions call ``move`` after committing, so a
+    query costs O(groups) and never touches the table. ``load`` replaces the
+    whole index from GROUP BY totals (at startup and on each rebuild).
+
+    Writers hold ``writing()`` from their commit until their delta is applied,
+    and a rebuild holds ``rebuilding()`` from its GROUP BYs until ``load``.
+    Each commit then lands wholly before the rebuild's queries (counted by
+    them, delta replaced by ``load``) or wholly after ``load`` (delta applied
+    on top), so no write is lost or counted twice.
+    """
+
+    def __init__(self):
+        # dimension -> value -> status -> [amount, count]
+        self.totals: Dict[str, Dict[Any, Dict[str, List[float]]]] = {dim: {} for dim in DIMENSIONS}
+        self._writers = 0
+        self._rebuilding = False
+        self._changed = asyncio.Condition()
+
+    @asynccontextmanager
+    async def writing(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: not self._rebuilding)
+            self._writers += 1
+        try:
+            yield
+        finally:
+            async with self._changed:
+                self._writers -= 1
+                self._changed.notify_all()
+
+    @asynccontextmanager
+    async def rebuilding(self):
+        """Exclusive against ``writing()``; new writers wait from now, so a rebuild can't be starved."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: not self._rebuilding)
+            self._rebuilding = True
+            await self._changed.wait_for(lambda: self._writers == 0)
+        try:
+            yield
+        finally:
+            async with self._changed:
+                self._rebuilding = False
+                self._changed.notify_all()
+
+    def _bump(self, loc: Any, status: str, amount: float, count: int) -> None:
+        for dim in DIMENSIONS:
+            value = _field(loc, dim)
+            by_status = self.totals[dim].setdefault(value, {})
+            cell = by_status.setdefault(status, [0.0, 0])
+            cell[0] += amount
+            cell[1] += count
+            if cell[1] <= 0:
+                del by_status[status]
+                if not by_status:
+                    del self.totals[dim][value]
+
+    def add(self, loc: Any) -> None:
+        self._bump(loc, _status(_field(loc, "status")), _field(loc, "amount") or 0.0, 1)
+
+    def move(self, loc: Any, old_status: Any, new_status: Any) -> None:
+        amount = _field(loc, "amount") or 0.0
+        self._bump(loc, _status(old_status), -amount, -1)
+        self._bump(loc, _status(new_status), amount, 1)
+
+    def load(self, rows: Iterable[GroupRow]) -> None:
+        totals: Dict[str, Dict[Any, Dict[str, List[float]]]] = {dim: {} for dim in DIMENSIONS}
+        for dim, value, status, amount, count in rows:
+            totals[dim].setdefault(value, {})[_status(status)] = [amount or 0.0, count]
+        self.totals = totals
+
+    def groups(self, dim: str, value: Optional[Any] = None) -> Dict[Any, Dict[str, Any]]:
+        values = self.totals[dim]
+        if value is not None:
+            values = {value: values[value]} if value in values else {}
+        out = {}
+        for key, by_status in values.items():
+            out[key] = {
+                "open_amount": sum(a for s, (a, _) in by_status.items() if s not in CLOSED_STATUSES),
+                "open_count": sum(c for s, (_, c) in by_status.items() if s not in CLOSED_STATUSES),
+                "statuses": {s: {"amount": a, "count": c} for s, (a, c) in by_status.items()},
+            }
+        return out
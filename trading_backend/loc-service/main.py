@@ -1,28 +1,39 @@
 import os
 import asyncio
+import base64
+import json
+import time
 from datetime import datetime
 from enum import Enum
-from typing import List, Optional
+from typing import Any, Dict, List, Mapping, Optional
 
 import httpx
-import websockets
 from fastapi import (
     FastAPI,
     WebSocket,
     WebSocketDisconnect,
     HTTPException,
     Depends,
+    Query,
+    Response,
 )
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
-from sqlalchemy import Integer, String, Float, DateTime, Enum as SqlEnum, select
+from sqlalchemy import Integer, String, Float, DateTime, Enum as SqlEnum, Index, func, insert, select, tuple_, update
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import declarative_base, mapped_column
 import logging
 from starlette.requests import Request
 from jose import JWTError, jwt
 
+from bulk_ingest import CSV, FORMATS, NDJSON, RowParser, iter_lines
+from events import broker_from_env, offset_key
+from exposure import DIMENSIONS, EXPOSURE_REBUILD_INTERVAL, ExposureIndex
+from price_stream import PriceStream
+from record_cache import ReadThroughCache
+
 # ==========================================================
 # LOGGING SETUP
 # ==========================================================
@@ -46,6 +57,39 @@ DATABASE_URL = os.getenv(
 JWT_SECRET = os.getenv("JWT_SECRET", "supersecret")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 
+# GET /loc page size, and rows fetched per round trip when streaming NDJSON
+LOC_PAGE_SIZE = int(os.getenv("LOC_PAGE_SIZE", "100"))
+LOC_MAX_PAGE_SIZE = int(os.getenv("LOC_MAX_PAGE_SIZE", "1000"))
+LOC_STREAM_CHUNK = int(os.getenv("LOC_STREAM_CHUNK", "1000"))
+# Most ids accepted by one POST /loc/transition
+LOC_MAX_BULK_TRANSITION = int(os.getenv("LOC_MAX_BULK_TRANSITION", "10000"))
+# Rows validated and inserted per transaction by POST /loc/apply/bulk, and
+# how many row errors its report lists
+LOC_BULK_CHUNK = int(os.getenv("LOC_BULK_CHUNK", "1000"))
+LOC_BULK_MAX_ERRORS = int(os.getenv("LOC_BULK_MAX_ERRORS", "1000"))
+
+# Country whose price is recorded on new LoCs
+LOC_PRICE_COUNTRY = os.getenv("LOC_PRICE_COUNTRY", "IN")
+# GET /loc/events: events per response and longest long-poll, in seconds
+LOC_EVENT_BATCH = int(os.getenv("LOC_EVENT_BATCH", "500"))
+LOC_EVENT_MAX_WAIT = float(os.getenv("LOC_EVENT_MAX_WAIT", "30"))
+
+# One upstream price socket shared by every /ws/loc/price client; its last
+# tick per symbol is also the latest-price cache
+PRICE_STREAM = PriceStream()
+# Open amount per buyer/seller/commodity and status, kept current by every write
+EXPOSURE = ExposureIndex()
+# Every create and transition, in commit order, for /loc/events and the gateway feed
+EVENTS = broker_from_env()
+# GET /loc/{id} read-through cache, invalidated by transitions
+LOC_CACHE = ReadThroughCache("loc")
+# Pooled keep-alive client for trade-exchange HTTP calls (cache misses, /loc/price)
+PRICE_CLIENT = httpx.AsyncClient(
+    base_url=TRADE_EXCHANGE_URL,
+    timeout=httpx.Timeout(5.0),
+    limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60),
+)
+
 # ==========================================================
 # DATABASE SETUP
 # ==========================================================
@@ -61,18 +105,36 @@ class LoCStatus(str, Enum):
     COMPLETED = "COMPLETED"
 
 
+# target status -> (status it must currently be in, role allowed to move it there)
+LOC_TRANSITIONS = {
+    LoCStatus.ISSUED: (LoCStatus.PENDING, "bank"),
+    LoCStatus.VERIFIED: (LoCStatus.ISSUED, "bank"),
+    LoCStatus.COMPLETED: (LoCStatus.VERIFIED, "seller"),
+}
+
+
 class LoC(Base):
     __tablename__ = "locs"
 
     id = mapped_column(Integer, primary_key=True, index=True)
-    buyer_id = mapped_column(String, index=True)
-    seller_id = mapped_column(String, index=True)
+    buyer_id = mapped_column(String)
+    seller_id = mapped_column(String)
     amount = mapped_column(Float)
     commodity = mapped_column(String)
     latest_price = mapped_column(Float, nullable=True)
     status = mapped_column(SqlEnum(LoCStatus), default=LoCStatus.PENDING)
     created_at = mapped_column(DateTime, default=datetime.utcnow)
 
+    # Keyset pages are ordered by (created_at, id); each filter gets an index
+    # that leads with the filtered column so a page is one index range scan
+    __table_args__ = (
+        Index("ix_locs_created_id", "created_at", "id"),
+        Index("ix_locs_buyer_created_id", "buyer_id", "created_at", "id"),
+        Index("ix_locs_seller_created_id", "seller_id", "created_at", "id"),
+        Index("ix_locs_status_created_id", "status", "created_at", "id"),
+        Index("ix_locs_commodity_created_id", "commodity", "created_at", "id"),
+    )
+
 
 # ==========================================================
 # Pydantic Schemas
@@ -98,6 +160,33 @@ class LoCOut(BaseModel):
         from_attributes = True
 
 
+class BulkTransitionRequest(BaseModel):
+    ids: List[int]
+    status: LoCStatus
+
+
+class TransitionResult(BaseModel):
+    id: int
+    ok: bool
+    status: Optional[LoCStatus] = None
+    detail: Optional[str] = None
+
+
+class BulkTransitionOut(BaseModel):
+    status: LoCStatus
+    updated: int
+    results: List[TransitionResult]
+
+
+class BulkApplyOut(BaseModel):
+    inserted: int
+    rejected: int
+    seconds: float
+    rows_per_sec: float
+    errors: List[Dict[str, Any]]
+    errors_truncated: bool = False
+
+
 # ==========================================================
 # FASTAPI APP SETUP
 # ==========================================================
@@ -129,6 +218,41 @@ def get_current_user_role(token: str = Depends(oauth2_scheme)) -> str:
 async def on_startup():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # create_all skips indexes on tables that already exist
+        for index in LoC.__table__.indexes:
+            await conn.run_sync(index.create, checkfirst=True)
+    await rebuild_exposure()
+    asyncio.create_task(maintain_exposure())
+    PRICE_STREAM.start()
+
+
+async def rebuild_exposure():
+    # Local writes wait from before the GROUP BYs until load, so none is overwritten by older totals
+    async with EXPOSURE.rebuilding():
+        rows = []
+        async with SessionLocal() as session:
+            for dim in DIMENSIONS:
+                column = getattr(LoC, dim)
+                result = await session.execute(
+                    select(column, LoC.status, func.sum(LoC.amount), func.count()).group_by(column, LoC.status)
+                )
+                rows.extend((dim, *row) for row in result.all())
+        EXPOSURE.load(rows)
+
+
+async def maintain_exposure():
+    while True:
+        await asyncio.sleep(EXPOSURE_REBUILD_INTERVAL)
+        try:
+            await rebuild_exposure()
+        except Exception:
+            logging.exception("Exposure rebuild failed")
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await PRICE_STREAM.stop()
+    await PRICE_CLIENT.aclose()
 
 
 # ==========================================================
@@ -141,6 +265,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -148,19 +273,26 @@ app.add_middleware(
 # WebSocket: Real-time Price Proxy
 # ==========================================================
 @app.websocket("/ws/loc/price")
-async def ws_loc_price(websocket: WebSocket, country: str, commodity: str):
+async def ws_loc_price(websocket: WebSocket, country: str, commodity: str, since_seq: Optional[int] = None):
     await websocket.accept()
     await websocket.send_text("Connected to price feed")
-    trade_ws_url = f"ws://trade-exchange-service:8000/ws/prices"
+    # Served from the shared upstream connection; since_seq lets a reconnecting
+    # client pick up from the last tick it saw
+    client = await PRICE_STREAM.subscribe(country, commodity, since_seq)
     try:
-        async with websockets.connect(trade_ws_url) as trade_ws:
-            while True:
-                msg = await trade_ws.recv()
-                await websocket.send_text(msg)
+        while True:
+            await websocket.send_text(await client.get())
     except WebSocketDisconnect:
         logging.info("Client disconnected")
     except Exception as e:
-        await websocket.close(code=1011, reason=str(e))
+        logging.info(f"Price socket closed: {e}")
+    finally:
+        await PRICE_STREAM.unsubscribe(client)
+
+
+@app.get("/ws/loc/price/stats")
+async def ws_loc_price_stats():
+    return PRICE_STREAM.stats()
 
 
 # ==========================================================
@@ -178,14 +310,59 @@ async def ping():
 
 @app.get("/loc/price")
 async def get_real_time_price(country: str, commodity: str):
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            f"{TRADE_EXCHANGE_URL}/prices",
-            params={"country": country, "commodity": commodity},
+    try:
+        resp = await PRICE_CLIENT.get("/prices", params={"country": country, "commodity": commodity})
+    except httpx.HTTPError:
+        raise HTTPException(status_code=502, detail="Failed to fetch price feed")
+    if resp.status_code != 200:
+        raise HTTPException(status_code=502, detail="Failed to fetch price feed")
+    return resp.json()
+
+
+async def latest_price(country: str, commodity: str) -> Optional[float]:
+    """Latest price from the stream cache, falling back to one ``/prices?last_n=1`` call on a miss."""
+    price = PRICE_STREAM.latest_price(country, commodity)
+    if price is not None:
+        return price
+    try:
+        resp = await PRICE_CLIENT.get(
+            "/prices",
+            params={"country": country, "commodity": commodity, "last_n": 1},
         )
-        if resp.status_code != 200:
-            raise HTTPException(status_code=502, detail="Failed to fetch price feed")
-        return resp.json()
+    except httpx.HTTPError as e:
+        logging.warning(f"Price lookup failed for {country}:{commodity}: {e}")
+        return None
+    data = resp.json() if resp.status_code == 200 else None
+    if not isinstance(data, list) or not data:
+        return None
+    PRICE_STREAM.prime(country, commodity, data[-1])
+    # Keep this symbol streaming so the next lookup is a cache hit
+    await PRICE_STREAM.watch(country, commodity)
+    return data[-1].get("price")
+
+
+# ==========================================================
+# LoC Events
+# ==========================================================
+EVENT_FIELDS = ("id", "buyer_id", "seller_id", "commodity", "amount")
+
+
+def loc_event(kind: str, loc: Any, status: LoCStatus, previous: Optional[LoCStatus] = None) -> Dict[str, Any]:
+    """A ``loc.created`` / ``loc.transitioned`` event from an ORM row or a row mapping."""
+    event = {"type": kind, "status": status.value, "previous_status": previous.value if previous else None, "ts": time.time()}
+    for name in EVENT_FIELDS:
+        event[name] = loc[name] if isinstance(loc, Mapping) else getattr(loc, name)
+    return event
+
+
+async def publish_events(events: List[Dict[str, Any]]) -> None:
+    """Publish after commit; a broker outage is logged rather than failing a write that already happened."""
+    if not events:
+        return
+    try:
+        await EVENTS.publish(events)
+    except Exception:
+        logging.exception(f"Failed to publish {len(events)} LoC event(s)")
 
 
 # ==========================================================
@@ -196,87 +373,380 @@ async def apply_for_loc(loc: LoCRequest, role: str = Depends(get_current_user_ro
     if role != "buyer":
         raise HTTPException(status_code=403, detail="Only buyers can apply for LoC.")
 
-    # Fetch latest commodity price
-    latest_price = None
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            f"{TRADE_EXCHANGE_URL}/prices",
-            params={"country": "IN", "commodity": loc.commodity},
-        )
-        if resp.status_code == 200:
-            data = resp.json()
-            if isinstance(data, list) and data:
-                latest_price = data[-1].get("price")
+    price = await latest_price(LOC_PRICE_COUNTRY, loc.commodity)
 
     async with SessionLocal() as session:
-        db_loc = LoC(**loc.dict(), latest_price=latest_price)
+        db_loc = LoC(**loc.dict(), latest_price=price)
         session.add(db_loc)
+        async with EXPOSURE.writing():
+            try:
+                await session.commit()
+                await session.refresh(db_loc)
+            except Exception as e:
+                await session.rollback()
+                logging.exception("Error committing LoC to DB")
+                raise HTTPException(status_code=500, detail="Database error")
+            EXPOSURE.add(db_loc)
+    await publish_events([loc_event("loc.created", db_loc, LoCStatus.PENDING)])
+    return db_loc
+
+
+async def insert_chunk(valid, prices: Dict[str, Optional[float]], errors: List[Dict[str, Any]]) -> int:
+    """Insert one validated chunk in its own transaction; on failure every row in it is reported."""
+    if not valid:
+        return 0
+    missing = list({loc.commodity for _, loc in valid if loc.commodity not in prices})
+    if missing:
+        # One lookup per commodity, shared by every later chunk of this upload
+        found = await asyncio.gather(*(latest_price(LOC_PRICE_COUNTRY, c) for c in missing))
+        prices.update(zip(missing, found))
+    rows = [{**loc.model_dump(), "latest_price": prices[loc.commodity]} for _, loc in valid]
+    async with SessionLocal() as session, EXPOSURE.writing():
         try:
+            # Executemany is sent as multi-row INSERT ... VALUES batches. RETURNING carries every
+            # field the exposure index and events need, so row order doesn't matter and
+            # sort_by_parameter_order (which some drivers can only honour row by row) isn't used.
+            result = await session.execute(
+                insert(LoC).returning(LoC.id, LoC.buyer_id, LoC.seller_id, LoC.commodity, LoC.amount), rows
+            )
+            created = result.mappings().all()
             await session.commit()
-            await session.refresh(db_loc)
-            return db_loc
-        except Exception as e:
+        except Exception:
             await session.rollback()
-            logging.exception("Error committing LoC to DB")
-            raise HTTPException(status_code=500, detail="Database error")
+            logging.exception("Error inserting bulk LoC chunk")
+            errors.extend({"row": row, "error": "database error"} for row, _ in valid)
+            return 0
+        for loc in created:
+            EXPOSURE.add({**loc, "status": LoCStatus.PENDING})
+    await publish_events([loc_event("loc.created", loc, LoCStatus.PENDING) for loc in created])
+    return len(created)
+
+
+@app.post("/loc/apply/bulk", response_model=BulkApplyOut)
+async def bulk_apply_for_loc(
+    request: Request,
+    format: Optional[str] = Query(None, pattern=f"^({'|'.join(FORMATS)})$"),
+    role: str = Depends(get_current_user_role),
+):
+    """Create LoCs from an NDJSON or CSV body (one ``LoCRequest`` per line/row).
+
+    The body is read as a stream and handled LOC_BULK_CHUNK rows at a time,
+    each chunk committed separately, so a bad row or chunk only rejects
+    itself. The format defaults from the Content-Type.
+    """
+    if role not in ("buyer", "bank"):
+        raise HTTPException(status_code=403, detail="Only buyers and banks can apply for LoCs.")
+    if format is None:
+        format = CSV if "csv" in request.headers.get("content-type", "") else NDJSON
+    parser = RowParser(format, LoCRequest)
+    started = time.perf_counter()
+    prices: Dict[str, Optional[float]] = {}
+    errors: List[Dict[str, Any]] = []
+    inserted = rejected = 0
+    chunk = []
+    row = 0
+
+    async def flush():
+        nonlocal inserted, rejected
+        valid, bad = parser.parse(chunk)
+        errors.extend(bad)
+        n = await insert_chunk(valid, prices, errors)
+        inserted += n
+        rejected += len(bad) + len(valid) - n
+        # Only the first LOC_BULK_MAX_ERRORS are reported; the count covers them all
+        del errors[LOC_BULK_MAX_ERRORS:]
+        chunk.clear()
+
+    async for line in iter_lines(request.stream()):
+        row += 1
+        if not line.strip():
+            continue
+        if parser.wants_header():
+            parser.set_header(line)
+            continue
+        chunk.append((row, line))
+        if len(chunk) >= LOC_BULK_CHUNK:
+            await flush()
+    if chunk:
+        await flush()
+
+    seconds = time.perf_counter() - started
+    return BulkApplyOut(
+        inserted=inserted,
+        rejected=rejected,
+        seconds=round(seconds, 3),
+        rows_per_sec=round(inserted / seconds, 1) if seconds > 0 else 0.0,
+        errors=errors,
+        errors_truncated=rejected > len(errors),
+    )
+
+
+def check_transition(target: LoCStatus, role: str) -> LoCStatus:
+    """The status a LoC must be in to move to ``target``; 400/403 if ``role`` can't do that."""
+    if target not in LOC_TRANSITIONS:
+        raise HTTPException(status_code=400, detail=f"LoCs cannot be moved to {target.value}")
+    expected, allowed_role = LOC_TRANSITIONS[target]
+    if role != allowed_role:
+        raise HTTPException(status_code=403, detail=f"Only {allowed_role}s can move a LoC to {target.value}.")
+    return expected
+
+
+async def transition_loc(loc_id: int, target: LoCStatus, role: str) -> LoC:
+    """Move one LoC with a single guarded UPDATE; only on failure is the row read to say why."""
+    expected = check_transition(target, role)
+    async with SessionLocal() as session:
+        result = await session.execute(
+            update(LoC)
+            .where(LoC.id == loc_id, LoC.status == expected)
+            .values(status=target)
+            .returning(LoC)
+        )
+        loc = result.scalar_one_or_none()
+        if loc is not None:
+            async with EXPOSURE.writing():
+                await session.commit()
+                EXPOSURE.move(loc, expected, target)
+            await LOC_CACHE.invalidate(loc_id)
+            await publish_events([loc_event("loc.transitioned", loc, target, expected)])
+            return loc
+        current = await session.scalar(select(LoC.status).where(LoC.id == loc_id))
+    if current is None:
+        raise HTTPException(status_code=404, detail="LoC not found")
+    raise HTTPException(
+        status_code=409,
+        detail=f"LoC is {current.value}; it must be {expected.value} to become {target.value}",
+    )
 
 
 @app.post("/loc/issue/{loc_id}", response_model=LoCOut)
 async def issue_loc(loc_id: int, role: str = Depends(get_current_user_role)):
-    if role != "bank":
-        raise HTTPException(status_code=403, detail="Only banks can issue LoC.")
-    async with SessionLocal() as session:
-        loc = await session.get(LoC, loc_id)
-        if not loc:
-            raise HTTPException(status_code=404, detail="LoC not found")
-        loc.status = LoCStatus.ISSUED
-        await session.commit()
-        await session.refresh(loc)
-        return loc
+    return await transition_loc(loc_id, LoCStatus.ISSUED, role)
 
 
 @app.post("/loc/verify/{loc_id}", response_model=LoCOut)
 async def verify_loc(loc_id: int, role: str = Depends(get_current_user_role)):
-    if role != "bank":
-        raise HTTPException(status_code=403, detail="Only banks can verify LoC.")
-    async with SessionLocal() as session:
-        loc = await session.get(LoC, loc_id)
-        if not loc:
-            raise HTTPException(status_code=404, detail="LoC not found")
-        loc.status = LoCStatus.VERIFIED
-        await session.commit()
-        await session.refresh(loc)
-        return loc
+    return await transition_loc(loc_id, LoCStatus.VERIFIED, role)
 
 
 @app.post("/loc/complete/{loc_id}", response_model=LoCOut)
 async def complete_loc(loc_id: int, role: str = Depends(get_current_user_role)):
-    if role != "seller":
-        raise HTTPException(status_code=403, detail="Only sellers can complete LoC.")
+    return await transition_loc(loc_id, LoCStatus.COMPLETED, role)
+
+
+@app.post("/loc/transition", response_model=BulkTransitionOut)
+async def bulk_transition(req: BulkTransitionRequest, role: str = Depends(get_current_user_role)):
+    """Move many LoCs to ``req.status`` in one UPDATE, reporting each id.
+
+    Ids that didn't move are looked up in one more query to report whether
+    they don't exist or are in the wrong status.
+    """
+    expected = check_transition(req.status, role)
+    ids = list(dict.fromkeys(req.ids))
+    if len(ids) > LOC_MAX_BULK_TRANSITION:
+        raise HTTPException(status_code=400, detail=f"At most {LOC_MAX_BULK_TRANSITION} ids per request")
+    async with SessionLocal() as session:
+        result = await session.execute(
+            update(LoC)
+            .where(LoC.id.in_(ids), LoC.status == expected)
+            .values(status=req.status)
+            .returning(LoC.id, LoC.buyer_id, LoC.seller_id, LoC.commodity, LoC.amount)
+            .execution_options(synchronize_session=False)
+        )
+        moved_rows = result.mappings().all()
+        async with EXPOSURE.writing():
+            await session.commit()
+            for row in moved_rows:
+                EXPOSURE.move(row, expected, req.status)
+        moved = {row["id"] for row in moved_rows}
+        await LOC_CACHE.invalidate(*moved)
+        await publish_events([loc_event("loc.transitioned", row, req.status, expected) for row in moved_rows])
+        missed = [loc_id for loc_id in ids if loc_id not in moved]
+        current = {}
+        if missed:
+            rows = await session.execute(select(LoC.id, LoC.status).where(LoC.id.in_(missed)))
+            current = dict(rows.all())
+
+    results = []
+    for loc_id in ids:
+        if loc_id in moved:
+            results.append(TransitionResult(id=loc_id, ok=True, status=req.status))
+        elif loc_id in current:
+            results.append(TransitionResult(
+                id=loc_id,
+                ok=False,
+                status=current[loc_id],
+                detail=f"must be {expected.value}",
+            ))
+        else:
+            results.append(TransitionResult(id=loc_id, ok=False, detail="not found"))
+    return BulkTransitionOut(status=req.status, updated=len(moved), results=results)
+
+
+@app.get("/loc/exposure")
+async def loc_exposure(
+    by: str = Query("buyer_id", pattern=f"^({'|'.join(DIMENSIONS)})$"),
+    key: Optional[str] = None,
+):
+    """LoC amount and count per status for every ``by`` value (or just ``key``), plus the open totals."""
+    return {"by": by, "groups": EXPOSURE.groups(by, key)}
+
+
+@app.get("/loc/events")
+async def loc_events(
+    after: Optional[str] = None,
+    wait: float = Query(0, ge=0, le=LOC_EVENT_MAX_WAIT),
+    limit: int = Query(LOC_EVENT_BATCH, ge=1, le=LOC_EVENT_BATCH),
+    loc_id: Optional[int] = None,
+    buyer_id: Optional[str] = None,
+    seller_id: Optional[str] = None,
+    commodity: Optional[str] = None,
+    status: Optional[LoCStatus] = None,
+):
+    """Events after the ``after`` offset that match the filters, long-polling up to ``wait`` seconds.
+
+    Without ``after`` only the current head is returned, to start tailing from.
+    ``next`` is the offset to pass as ``after`` on the next call; it advances
+    past filtered-out events too. ``reset`` means events after ``after`` were
+    already trimmed, or ``after`` came from before a loc-service restart, so
+    the caller has missed some and should reload state.
+    """
+    if after is None:
+        return {"events": [], "next": await EVENTS.head(), "reset": False}
+    try:
+        offset_key(after)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid offset")
+    wanted = {
+        name: value
+        for name, value in (("id", loc_id), ("buyer_id", buyer_id), ("seller_id", seller_id), ("commodity", commodity))
+        if value is not None
+    }
+    if status is not None:
+        wanted["status"] = status.value
+    deadline = time.monotonic() + wait
+    reset = False
+    while True:
+        try:
+            entries, trimmed = await EVENTS.read(after, limit, max(deadline - time.monotonic(), 0))
+        except ValueError:
+            # e.g. a stream id sent to the memory broker after a broker switch
+            raise HTTPException(status_code=400, detail="Invalid offset")
+        reset = reset or trimmed
+        if trimmed and not entries:
+            # Nothing retained from before the reset; resume from the start of the log
+            after = "0"
+        events = [
+            {"offset": offset, **event}
+            for offset, event in entries
+            if all(event.get(name) == value for name, value in wanted.items())
+        ]
+        if entries:
+            after = entries[-1][0]
+        # Keep waiting while only filtered-out events arrive
+        if events or not entries or time.monotonic() >= deadline:
+            return {"events": events, "next": after, "reset": reset}
+
+
+async def load_loc(loc_id: int) -> Optional[Dict[str, Any]]:
     async with SessionLocal() as session:
         loc = await session.get(LoC, loc_id)
-        if not loc:
-            raise HTTPException(status_code=404, detail="LoC not found")
-        loc.status = LoCStatus.COMPLETED
-        await session.commit()
-        await session.refresh(loc)
-        return loc
+        return LoCOut.model_validate(loc).model_dump(mode="json") if loc else None
 
 
 @app.get("/loc/{loc_id}", response_model=LoCOut)
 async def get_loc(loc_id: int):
+    loc = await LOC_CACHE.get(loc_id, lambda: load_loc(loc_id))
+    if not loc:
+        raise HTTPException(status_code=404, detail="LoC not found")
+    return loc
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {"loc": LOC_CACHE.stats()}
+
+
+def encode_cursor(loc: LoC) -> str:
+    raw = json.dumps([loc.created_at.isoformat(), loc.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, loc_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(loc_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def stream_locs(stmt, array: bool = False):
+    """NDJSON rows (or one JSON array) from a server-side cursor, LOC_STREAM_CHUNK rows per fetch."""
+    sep = "," if array else "\n"
+    first = True
+    if array:
+        yield "["
     async with SessionLocal() as session:
-        loc = await session.get(LoC, loc_id)
-        if not loc:
-            raise HTTPException(status_code=404, detail="LoC not found")
-        return loc
+        result = await session.stream_scalars(stmt.execution_options(yield_per=LOC_STREAM_CHUNK))
+        async for rows in result.partitions():
+            chunk = sep.join(LoCOut.model_validate(loc).model_dump_json() for loc in rows)
+            if array:
+                yield chunk if first else "," + chunk
+            else:
+                yield chunk + "\n"
+            first = False
+    if array:
+        yield "]"
 
 
 @app.get("/loc", response_model=List[LoCOut])
-async def list_locs():
+async def list_locs(
+    response: Response,
+    buyer_id: Optional[str] = None,
+    seller_id: Optional[str] = None,
+    status: Optional[LoCStatus] = None,
+    commodity: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    """LoCs oldest first.
+
+    Without ``limit`` or ``cursor`` every matching row comes back in one
+    list, streamed from the database, as before pagination existed. With
+    either, one page is returned: pass the ``X-Next-Cursor`` response header
+    back as ``cursor`` for the next page; it is absent on the last page.
+    ``format=ndjson`` streams every matching row (or ``limit`` rows).
+    """
+    stmt = select(LoC)
+    if buyer_id is not None:
+        stmt = stmt.where(LoC.buyer_id == buyer_id)
+    if seller_id is not None:
+        stmt = stmt.where(LoC.seller_id == seller_id)
+    if status is not None:
+        stmt = stmt.where(LoC.status == status)
+    if commodity is not None:
+        stmt = stmt.where(LoC.commodity == commodity)
+    if cursor is not None:
+        stmt = stmt.where(tuple_(LoC.created_at, LoC.id) > decode_cursor(cursor))
+    stmt = stmt.order_by(LoC.created_at, LoC.id)
+
+    if format == "ndjson":
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return StreamingResponse(stream_locs(stmt), media_type="application/x-ndjson")
+    if limit is None and cursor is None:
+        return StreamingResponse(stream_locs(stmt, array=True), media_type="application/json")
+
+    limit = min(limit or LOC_PAGE_SIZE, LOC_MAX_PAGE_SIZE)
     async with SessionLocal() as session:
-        result = await session.execute(select(LoC))
-        return result.scalars().all()
+        # One extra row tells us whether there is a next page
+        result = await session.execute(stmt.limit(limit + 1))
+        locs = result.scalars().all()
+    if len(locs) > limit:
+        locs = locs[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(locs[-1])
+    return locs
 
 
 # ==========================================================
@@ -0,0 +1,241 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set, Tuple
+
+import websockets
+
+logger = logging.getLogger("loc_service.price_stream")
+
+TRADE_EXCHANGE_WS_URL = os.getenv("TRADE_EXCHANGE_WS_URL", "ws://trade-exchange-service:8000/ws/prices")
+# Per-client queue; the oldest frame is dropped when a browser falls behind
+PRICE_STREAM_QUEUE_SIZE = int(os.getenv("PRICE_STREAM_QUEUE_SIZE", "256"))
+# Recent frames kept per symbol so a reconnecting client can resume from its seq
+PRICE_STREAM_REPLAY_DEPTH = int(os.getenv("PRICE_STREAM_REPLAY_DEPTH", "256"))
+PRICE_STREAM_BACKOFF_MIN = float(os.getenv("PRICE_STREAM_BACKOFF_MIN", "0.5"))
+PRICE_STREAM_BACKOFF_MAX = float(os.getenv("PRICE_STREAM_BACKOFF_MAX", "30"))
+# Seconds a cached latest price stays usable after it was received
+PRICE_CACHE_MAX_AGE = float(os.getenv("PRICE_CACHE_MAX_AGE", "30"))
+
+
+def symbol_key(country: str, commodity: str) -> str:
+    return f"{country.upper()}:{commodity.lower()}"
+
+
+class LocalClient:
+    """One browser socket's bounded queue of upstream frames for a single symbol."""
+
+    def __init__(self, key: str, max_queue: int = PRICE_STREAM_QUEUE_SIZE):
+        self.key = key
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(max_queue)
+        self.dropped = 0
+
+    def offer(self, frame: str) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(frame)
+
+    async def get(self) -> str:
+        return await self.queue.get()
+
+
+class PriceStream:
+    """A single upstream ``/ws/prices`` connection shared by every local client.
+
+    The upstream socket is subscribed to the union of the symbols local clients
+    want, using trade-exchange's subscribe protocol, and each tick is fanned out
+    to the clients of its symbol. If the connection drops it is re-opened with
+    jittered exponential backoff and resubscribed with the last seq seen per
+    symbol, so trade-exchange replays what was missed.
+
+    The last tick per symbol doubles as a latest-price cache. Symbols passed to
+    ``watch`` stay subscribed with no local client so their cache stays fed.
+    """
+
+    def __init__(
+        self,
+        url: str = TRADE_EXCHANGE_WS_URL,
+        replay_depth: int = PRICE_STREAM_REPLAY_DEPTH,
+        backoff_min: float = PRICE_STREAM_BACKOFF_MIN,
+        backoff_max: float = PRICE_STREAM_BACKOFF_MAX,
+        max_age: float = PRICE_CACHE_MAX_AGE,
+    ):
+        self.url = url
+        self.replay_depth = replay_depth
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.max_age = max_age
+        self.clients: Dict[str, Set[LocalClient]] = {}
+        # key -> recent (seq, frame), oldest first
+        self.recent: Dict[str, Deque[Tuple[int, str]]] = {}
+        # key -> last tick payload seen upstream
+        self.latest: Dict[str, Dict[str, Any]] = {}
+        # key -> monotonic time the latest payload arrived
+        self.received: Dict[str, float] = {}
+        self.watched: Set[str] = set()
+        self._ws = None
+        self._task: Optional[asyncio.Task] = None
+        self.connected = False
+        self.reconnects = 0
+        self.frames = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def subscribe(self, country: str, commodity: str, since_seq: Optional[int] = None) -> LocalClient:
+        key = symbol_key(country, commodity)
+        client = LocalClient(key)
+        if since_seq is not None:
+            self._replay(client, since_seq)
+        clients = self.clients.setdefault(key, set())
+        clients.add(client)
+        if len(clients) == 1 and key not in self.watched:
+            await self._send({"action": "subscribe", "symbols": [key]})
+        return client
+
+    async def unsubscribe(self, client: LocalClient) -> None:
+        clients = self.clients.get(client.key)
+        if clients is None:
+            return
+        clients.discard(client)
+        if not clients:
+            del self.clients[client.key]
+            if client.key not in self.watched:
+                await self._send({"action": "unsubscribe", "symbols": [client.key]})
+
+    async def watch(self, country: str, commodity: str) -> None:
+        key = symbol_key(country, commodity)
+        if key in self.watched:
+            return
+        self.watched.add(key)
+        if key not in self.clients:
+            await self._send({"action": "subscribe", "symbols": [key]})
+
+    def latest_price(self, country: str, commodity: str) -> Optional[float]:
+        """The cached price if it arrived within ``max_age`` seconds, else None."""
+        key = symbol_key(country, commodity)
+        latest = self.latest.get(key)
+        if latest is None or time.monotonic() - self.received[key] > self.max_age:
+            self.cache_misses += 1
+            return None
+        self.cache_hits += 1
+        return latest["price"]
+
+    def prime(self, country: str, commodity: str, payload: Dict[str, Any]) -> None:
+        """Seed the cache from an HTTP lookup until the stream delivers a newer tick."""
+        key = symbol_key(country, commodity)
+        self.latest[key] = {"country": key.split(":", 1)[0], "commodity": key.split(":", 1)[1], **payload}
+        self.received[key] = time.monotonic()
+
+    def _replay(self, client: LocalClient, since_seq: int) -> None:
+        """Queue the buffered frames after ``since_seq``, or a snapshot of the latest tick if they're gone."""
+        recent = self.recent.get(client.key)
+        latest = self.latest.get(client.key)
+        if not recent or latest is None or since_seq >= recent[-1][0]:
+            return
+        if since_seq >= recent[0][0] - 1:
+            for seq, frame in recent:
+                if seq > since_seq:
+                    client.offer(frame)
+            return
+        client.offer(json.dumps({"type": "snapshot", **latest}))
+
+    async def _send(self, msg: Dict[str, Any]) -> None:
+        ws = self._ws
+        if ws is None:
+            # Not connected; the union is (re)sent when the connection opens
+            return
+        try:
+            await ws.send(json.dumps(msg))
+        except websockets.ConnectionClosed:
+            pass
+
+    async def _run(self) -> None:
+        attempt = 0
+        while True:
+            try:
+                async with websockets.connect(f"{self.url}?encoding=json") as ws:
+                    self._ws = ws
+                    self.connected = True
+                    attempt = 0
+                    logger.info("Connected to price stream %s", self.url)
+                    # A bare /ws/prices socket starts on "*"; narrow it to what local clients want
+                    await ws.send(json.dumps({"action": "unsubscribe", "symbols": ["*"]}))
+                    symbols = set(self.clients) | self.watched
+                    if symbols:
+                        since = {key: self.recent[key][-1][0] for key in symbols if self.recent.get(key)}
+                        await ws.send(json.dumps({"action": "subscribe", "symbols": sorted(symbols), "since": since}))
+                    async for frame in ws:
+                        if isinstance(frame, str):
+                            self._dispatch(frame)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Price stream connection lost: %s", e)
+            finally:
+                self._ws = None
+                self.connected = False
+            # Full jitter keeps many loc-service replicas from reconnecting in lockstep
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_min * 2 ** attempt))
+            attempt += 1
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+
+    def _dispatch(self, frame: str) -> None:
+        try:
+            msg = json.loads(frame)
+            key = symbol_key(msg["country"], msg["commodity"])
+        except (ValueError, KeyError, TypeError, AttributeError):
+            if '"error"' in frame:
+                logger.warning("Price stream error: %s", frame)
+            return
+        self.frames += 1
+        kind = msg.get("type")
+        if kind == "snapshot":
+            # Upstream couldn't replay the gap; start chaining again from here
+            self.latest[key] = {k: msg.get(k) for k in ("country", "commodity", "price", "timestamp", "seq")}
+            self.recent.pop(key, None)
+            self.received[key] = time.monotonic()
+        elif kind is None:
+            seq = msg.get("seq")
+            self.latest[key] = msg
+            self.received[key] = time.monotonic()
+            if seq is not None:
+                recent = self.recent.get(key)
+                if recent is None:
+                    recent = self.recent[key] = deque(maxlen=self.replay_depth)
+                elif recent and seq != recent[-1][0] + 1:
+                    # Upstream sent a snapshot or restarted; older frames no longer chain
+                    recent.clear()
+                recent.append((seq, frame))
+        for client in self.clients.get(key, ()):
+            client.offer(frame)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "upstream": self.url,
+            "connected": self.connected,
+            "reconnects": self.reconnects,
+            "frames": self.frames,
+            "symbols": {key: len(clients) for key, clients in self.clients.items()},
+            "watched": sorted(self.watched),
+            "cache": {"hits": self.cache_hits, "misses": self.cache_misses, "max_age": self.max_age},
+            "dropped": sum(c.dropped for clients in self.clients.values() for c in clients),
+        }
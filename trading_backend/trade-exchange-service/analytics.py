@@ -0,0 +1,166 @@
+import math
+import os
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _int_list(value: str) -> List[int]:
+    return sorted({int(v) for v in value.split(",") if v.strip()})
+
+
+# Tick-count windows for SMA/stddev/min/max, and spans for the EMAs
+ANALYTICS_WINDOWS = _int_list(os.getenv("ANALYTICS_WINDOWS", "20,50,200"))
+ANALYTICS_EMA_SPANS = _int_list(os.getenv("ANALYTICS_EMA_SPANS", "12,26"))
+# Window (in returns) for realized volatility
+ANALYTICS_VOL_WINDOW = int(os.getenv("ANALYTICS_VOL_WINDOW", "50"))
+
+
+class RollingStats:
+    """Sum, sum of squares, min and max over the last ``size`` values.
+
+    Each update is O(1) (amortized for min/max, which use monotonic deques).
+    Running sums are rebuilt from the ring every ``size`` updates to stop
+    floating-point drift from accumulating.
+    """
+
+    def __init__(self, size: int):
+        if size < 1:
+            raise ValueError("window size must be positive")
+        self.size = size
+        self._values: List[float] = [0.0] * size
+        self._pos = 0
+        self.count = 0
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self._min: deque = deque()  # (seq, value), values increasing
+        self._max: deque = deque()  # (seq, value), values decreasing
+        self._seq = 0
+
+    def update(self, x: float) -> None:
+        pos = self._pos
+        if self.count == self.size:
+            old = self._values[pos]
+            self.sum -= old
+            self.sumsq -= old * old
+        else:
+            self.count += 1
+        self._values[pos] = x
+        self.sum += x
+        self.sumsq += x * x
+        self._pos = (pos + 1) % self.size
+
+        seq = self._seq
+        self._seq += 1
+        expired = seq - self.size
+        while self._min and self._min[-1][1] >= x:
+            self._min.pop()
+        self._min.append((seq, x))
+        if self._min[0][0] <= expired:
+            self._min.popleft()
+        while self._max and self._max[-1][1] <= x:
+            self._max.pop()
+        self._max.append((seq, x))
+        if self._max[0][0] <= expired:
+            self._max.popleft()
+
+        if self._pos == 0:
+            self._resum()
+
+    def _resum(self) -> None:
+        values = self._values[: self.count]
+        self.sum = math.fsum(values)
+        self.sumsq = math.fsum(v * v for v in values)
+
+    @property
+    def full(self) -> bool:
+        return self.count == self.size
+
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def stddev(self) -> Optional[float]:
+        """Sample standard deviation."""
+        if self.count < 2:
+            return None
+        var = (self.sumsq - self.sum * self.sum / self.count) / (self.count - 1)
+        return math.sqrt(max(var, 0.0))
+
+    def min(self) -> Optional[float]:
+        return self._min[0][1] if self._min else None
+
+    def max(self) -> Optional[float]:
+        return self._max[0][1] if self._max else None
+
+
+class SymbolAnalytics:
+    """Rolling statistics for one symbol, updated once per tick.
+
+    Ticks carry no traded volume, so there is no VWAP; add it once they do.
+    """
+
+    def __init__(
+        self,
+        windows: List[int] = ANALYTICS_WINDOWS,
+        ema_spans: List[int] = ANALYTICS_EMA_SPANS,
+        vol_window: int = ANALYTICS_VOL_WINDOW,
+    ):
+        self.windows = {w: RollingStats(w) for w in windows}
+        self.ema_alpha = {span: 2.0 / (span + 1) for span in ema_spans}
+        self.ema: Dict[int, float] = {}
+        self.returns = RollingStats(vol_window)
+        self.last: Optional[float] = None
+        self.last_ts: Optional[int] = None
+        self.ticks = 0
+
+    def update(self, ts_ns: int, price: float) -> None:
+        if self.last is not None and self.last > 0 and price > 0:
+            self.returns.update(math.log(price / self.last))
+        for stats in self.windows.values():
+            stats.update(price)
+        for span, alpha in self.ema_alpha.items():
+            prev = self.ema.get(span)
+            self.ema[span] = price if prev is None else prev + alpha * (price - prev)
+        self.last = price
+        self.last_ts = ts_ns
+        self.ticks += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        def per_window(fn) -> Dict[str, Optional[float]]:
+            return {str(w): fn(s) for w, s in self.windows.items()}
+
+        realized = math.sqrt(max(self.returns.sumsq, 0.0)) if self.returns.count else None
+        return {
+            "last": self.last,
+            "ticks": self.ticks,
+            "sma": per_window(RollingStats.mean),
+            "stddev": per_window(RollingStats.stddev),
+            "min": per_window(RollingStats.min),
+            "max": per_window(RollingStats.max),
+            "ema": {str(span): value for span, value in self.ema.items()},
+            "volatility": {
+                "window": self.returns.size,
+                "returns": self.returns.count,
+                "return_stddev": self.returns.stddev(),
+                "realized": realized,
+            },
+        }
+
+
+class AnalyticsStore:
+    """Per-symbol ``SymbolAnalytics`` keyed by ``"COUNTRY:commodity"``."""
+
+    def __init__(self):
+        self._symbols: Dict[str, SymbolAnalytics] = {}
+
+    def update(self, key: str, ts_ns: int, price: float) -> SymbolAnalytics:
+        stats = self._symbols.get(key)
+        if stats is None:
+            stats = self._symbols[key] = SymbolAnalytics()
+        stats.update(ts_ns, price)
+        return stats
+
+    def get(self, key: str) -> Optional[SymbolAnalytics]:
+        return self._symbols.get(key)
+
+    def items(self) -> List[Tuple[str, SymbolAnalytics]]:
+        return list(self._symbols.items())
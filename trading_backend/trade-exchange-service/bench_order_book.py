@@ -0,0 +1,66 @@
+"""Single-core throughput and latency benchmark for the matching engine.
+
+    python bench_order_book.py --orders 500000 --cancel-ratio 0.2
+
+Submits random limit orders around a drifting mid price (a share of them
+crossing the spread) and cancels a fraction of resting orders, timing every
+call. Reports sustained orders/sec and p50/p99/p99.9 latency.
+"""
+import argparse
+import random
+import time
+
+from order_book import BUY, SELL, MatchingEngine
+
+
+def run(orders: int, cancel_ratio: float, levels: int, seed: int) -> None:
+    rng = random.Random(seed)
+    engine = MatchingEngine(tick_size=0.01)
+    mid = 2000.0
+    open_ids = []
+    latencies = []
+    trades = 0
+    clock = time.perf_counter_ns
+
+    started = clock()
+    for _ in range(orders):
+        if open_ids and rng.random() < cancel_ratio:
+            i = rng.randrange(len(open_ids))
+            open_ids[i], open_ids[-1] = open_ids[-1], open_ids[i]
+            oid = open_ids.pop()
+            t0 = clock()
+            engine.cancel(oid)
+            latencies.append(clock() - t0)
+            continue
+        side = BUY if rng.random() < 0.5 else SELL
+        offset = rng.randint(-levels // 4, levels) * 0.01
+        price = mid - offset if side == BUY else mid + offset
+        qty = float(rng.randint(1, 100))
+        t0 = clock()
+        order, fills = engine.submit("gold", side, price, qty)
+        latencies.append(clock() - t0)
+        trades += len(fills)
+        if order.status == "open":
+            open_ids.append(order.id)
+        mid += rng.gauss(0, 0.01)
+    elapsed = (clock() - started) / 1e9
+
+    latencies.sort()
+
+    def pct(p: float) -> float:
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] / 1000
+
+    print(f"operations: {len(latencies)} ({trades} trades) in {elapsed:.2f}s")
+    print(f"throughput: {len(latencies) / elapsed:,.0f} ops/sec")
+    print(f"latency us: p50={pct(0.50):.1f} p99={pct(0.99):.1f} p99.9={pct(0.999):.1f} max={latencies[-1] / 1000:.1f}")
+    print(f"resting orders: {len(engine.orders)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--cancel-ratio", type=float, default=0.2)
+    parser.add_argument("--levels", type=int, default=200, help="price range in ticks either side of mid")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args.orders, args.cancel_ratio, args.levels, args.seed)
@@ -0,0 +1,390 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import struct
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Union
+
+from fastapi import WebSocket
+
+logger = logging.getLogger("trade_exchange.broadcast")
+
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+DISCONNECT = "disconnect"
+POLICIES = (DROP_OLDEST, COALESCE, DISCONNECT)
+
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "256"))
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", DROP_OLDEST)
+
+JSON = "json"
+BINARY = "binary"
+ENCODINGS = (JSON, BINARY)
+MAX_BATCH = 1000
+
+# Binary frame: header (magic, version, tick count) followed by fixed-size tick records
+# of (symbol id, sequence number, epoch-ns timestamp, price), all little-endian. Symbol
+# ids are announced with a {"type": "symbol"} text frame before a socket first sees them.
+FRAME_MAGIC = 0x50
+FRAME_VERSION = 2
+FRAME_HEADER = struct.Struct("<BBH")
+TICK_RECORD = struct.Struct("<IQqd")
+
+# Subscribing to this symbol receives every tick
+ALL_SYMBOLS = "*"
+
+# Close code sent to consumers evicted by the "disconnect" policy (RFC 6455 "Try Again Later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+def encode(payload: Any) -> str:
+    """Serialize a frame the same way ``WebSocket.send_json`` does."""
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+
+def pack_tick(symbol_id: int, seq: int, ts_ns: int, price: float) -> bytes:
+    return TICK_RECORD.pack(symbol_id, seq, ts_ns, price)
+
+
+def pack_frame(records: List[bytes]) -> bytes:
+    return FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, len(records)) + b"".join(records)
+
+
+def symbol_key(country: str, commodity: str) -> str:
+    return f"{country.upper()}:{commodity.lower()}"
+
+
+def normalize_symbol(symbol: str) -> str:
+    """Canonicalize ``"in:Wheat"`` to ``"IN:wheat"``; raises ValueError if malformed."""
+    if symbol == ALL_SYMBOLS:
+        return symbol
+    country, sep, commodity = symbol.partition(":")
+    if not sep or not country or not commodity:
+        raise ValueError(f"Invalid symbol: {symbol!r}, expected COUNTRY:commodity")
+    return symbol_key(country, commodity)
+
+
+class Subscriber:
+    """One socket with a bounded send queue drained by its own writer task.
+
+    When the queue is full the subscriber's policy decides what happens:
+    ``drop_oldest`` discards the oldest queued frame, ``coalesce`` keeps only the
+    latest price snapshot per symbol (events and replayed deltas are never
+    merged), and ``disconnect`` evicts the socket. Control frames are never
+    dropped; a socket with more than ``max_queue`` of them pending (besides one
+    symbol announcement per symbol) is evicted. The writer sends up to
+    ``batch`` queued ticks per frame.
+    """
+
+    def __init__(
+        self,
+        sub_id: int,
+        ws: WebSocket,
+        max_queue: int,
+        policy: str,
+        encoding: str = JSON,
+        batch: int = 1,
+        analytics: bool = False,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy: {policy}")
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding: {encoding}")
+        self.id = sub_id
+        self.ws = ws
+        self.max_queue = max_queue
+        self.policy = policy
+        self.encoding = encoding
+        self.batch = max(1, min(batch, MAX_BATCH))
+        # JSON ticks also carry the symbol's rolling analytics
+        self.analytics = analytics and encoding == JSON
+        # Symbols whose binary id this socket has been told about
+        self.announced: Set[str] = set()
+        # key -> (frame, enqueued_at, is_control); keys are unique per frame except coalesced snapshots
+        self._queue: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._controls = 0
+        self._seq = itertools.count()
+        self._ready = asyncio.Event()
+        self.symbols: Set[str] = set()
+        self.closed = False
+        self.evicted = False
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.connected_at = time.time()
+
+    def offer(self, key: str, frame: Union[str, bytes], coalesce: bool = True) -> bool:
+        """Queue a frame without blocking; returns False if the socket must be evicted.
+
+        Pass ``coalesce=False`` for frames a newer one must not replace (trade
+        events, replayed deltas).
+        """
+        if self.closed:
+            return False
+        now = time.monotonic()
+        coalesce = coalesce and self.policy == COALESCE
+        if coalesce and key in self._queue:
+            # Keep the original position and enqueue time so lag stays honest
+            _, enqueued_at, _ = self._queue[key]
+            self._queue[key] = (frame, enqueued_at, False)
+            self.coalesced += 1
+            return True
+        if len(self._queue) >= self.max_queue:
+            if self.policy == DISCONNECT:
+                return False
+            self._drop_oldest()
+        slot = key if coalesce else next(self._seq)
+        self._queue[slot] = (frame, now, False)
+        self._ready.set()
+        return True
+
+    def _drop_oldest(self) -> None:
+        for slot, (_, _, control) in self._queue.items():
+            if not control:
+                del self._queue[slot]
+                self.dropped += 1
+                return
+
+    def send_control(self, payload: Any) -> bool:
+        """Queue a protocol text frame; it is never dropped or batched.
+
+        Returns False, and evicts the socket, once its pending control frames
+        pass their own bound, so a client flooding requests can't grow it forever.
+        """
+        if self.closed:
+            return False
+        if self._controls >= self.max_queue + len(self.announced):
+            logger.warning("Evicting subscriber %s: %s control frames pending", self.id, self._controls)
+            self.evicted = True
+            self.close()
+            return False
+        self._queue[next(self._seq)] = (encode(payload), time.monotonic(), True)
+        self._controls += 1
+        self._ready.set()
+        return True
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def run(self) -> None:
+        """Writer loop: drain the queue onto the socket until closed or the send fails."""
+        try:
+            while not self.closed:
+                if not self._queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                _, (frame, _, control) = self._queue.popitem(last=False)
+                if control:
+                    self._controls -= 1
+                if control or (self.encoding == BINARY and isinstance(frame, str)):
+                    # Protocol replies and JSON-only events (e.g. trades) go out as single text frames
+                    await self.ws.send_text(frame)
+                    continue
+                frames = [frame]
+                while len(frames) < self.batch and self._queue:
+                    slot, (nxt, _, nxt_control) = next(iter(self._queue.items()))
+                    if nxt_control or type(nxt) is not type(frame):
+                        break
+                    del self._queue[slot]
+                    frames.append(nxt)
+                if self.encoding == BINARY:
+                    await self.ws.send_bytes(pack_frame(frames))
+                elif self.batch > 1:
+                    await self.ws.send_text("[" + ",".join(frames) + "]")
+                else:
+                    await self.ws.send_text(frame)
+                self.sent += len(frames)
+        except Exception as e:
+            logger.info("Subscriber %s send failed: %s", self.id, e)
+        finally:
+            self.closed = True
+            self._queue.clear()
+            self._controls = 0
+            if self.evicted:
+                try:
+                    await self.ws.close(code=SLOW_CONSUMER_CLOSE_CODE, reason="Slow consumer")
+                except Exception:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        lag_ms = 0.0
+        if self._queue:
+            _, (_, enqueued_at, _) = next(iter(self._queue.items()))
+            lag_ms = round((time.monotonic() - enqueued_at) * 1000, 3)
+        client = self.ws.client
+        return {
+            "id": self.id,
+            "client": f"{client.host}:{client.port}" if client else None,
+            "policy": self.policy,
+            "encoding": self.encoding,
+            "batch": self.batch,
+            "analytics": self.analytics,
+            "symbols": sorted(self.symbols),
+            "queued": len(self._queue),
+            "max_queue": self.max_queue,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "lag_ms": lag_ms,
+            "connected_at": self.connected_at,
+        }
+
+
+class BroadcastHub:
+    """Fan-out of price frames: each frame is serialized once and queued per subscriber.
+
+    Subscribers are indexed by symbol, so a tick is only serialized and queued
+    when someone subscribed to it (or to ``"*"``).
+    """
+
+    def __init__(self, max_queue: int = WS_QUEUE_SIZE, policy: str = WS_SLOW_CONSUMER_POLICY):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy: {policy}")
+        self.max_queue = max_queue
+        self.policy = policy
+        self._ids = itertools.count(1)
+        self.subscribers: Dict[int, Subscriber] = {}
+        self._by_symbol: Dict[str, Set[Subscriber]] = {}
+        self.symbol_ids: Dict[str, int] = {}
+        self.evicted = 0
+
+    def subscribe(
+        self,
+        ws: WebSocket,
+        policy: Optional[str] = None,
+        max_queue: Optional[int] = None,
+        symbols: Iterable[str] = (),
+        encoding: str = JSON,
+        batch: int = 1,
+        analytics: bool = False,
+    ) -> Subscriber:
+        sub = Subscriber(next(self._ids), ws, max_queue or self.max_queue, policy or self.policy, encoding, batch, analytics)
+        self.subscribers[sub.id] = sub
+        self.add_symbols(sub, symbols)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        sub.close()
+        self.remove_symbols(sub, list(sub.symbols))
+        self.subscribers.pop(sub.id, None)
+
+    def add_symbols(self, sub: Subscriber, symbols: Iterable[str]) -> None:
+        for symbol in symbols:
+            sub.symbols.add(symbol)
+            self._by_symbol.setdefault(symbol, set()).add(sub)
+
+    def remove_symbols(self, sub: Subscriber, symbols: Iterable[str]) -> None:
+        for symbol in symbols:
+            sub.symbols.discard(symbol)
+            subs = self._by_symbol.get(symbol)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._by_symbol[symbol]
+
+    def interested(self, key: str) -> List[Subscriber]:
+        targets = self._by_symbol.get(key, set()) | self._by_symbol.get(ALL_SYMBOLS, set())
+        return list(targets)
+
+    def symbol_id(self, key: str) -> int:
+        sid = self.symbol_ids.get(key)
+        if sid is None:
+            sid = self.symbol_ids[key] = len(self.symbol_ids) + 1
+        return sid
+
+    def publish(
+        self,
+        key: str,
+        payload: Dict[str, Any],
+        ts_ns: int,
+        price: float,
+        seq: int,
+        analytics: Optional[Callable[[], Dict[str, Any]]] = None,
+    ) -> int:
+        """Queue a tick for subscribers of ``key``; returns the number it was queued for.
+
+        Each frame variant (JSON, JSON with ``analytics()`` attached, binary
+        record) is built at most once, and only if some subscriber uses it.
+        """
+        targets = self.interested(key)
+        if not targets:
+            return 0
+        frames: Dict[str, Union[str, bytes]] = {}
+        delivered = 0
+        for sub in targets:
+            if sub.closed:
+                # Writer already exited because the socket went away
+                self.unsubscribe(sub)
+                continue
+            if sub.offer(key, self._frame(sub, frames, key, payload, ts_ns, price, seq, analytics)):
+                delivered += 1
+            else:
+                self.evict(sub)
+        return delivered
+
+    def send_to(self, sub: Subscriber, key: str, payload: Dict[str, Any], ts_ns: int, price: float, seq: int) -> bool:
+        """Queue one tick for a single subscriber (used to replay missed ticks on resume)."""
+        if sub.offer(key, self._frame(sub, {}, key, payload, ts_ns, price, seq, None), coalesce=False):
+            return True
+        self.evict(sub)
+        return False
+
+    def _frame(self, sub, cache, key, payload, ts_ns, price, seq, analytics) -> Union[str, bytes]:
+        if sub.encoding == BINARY:
+            if key not in sub.announced:
+                sub.announced.add(key)
+                sub.send_control({"type": "symbol", "id": self.symbol_id(key), "symbol": key})
+            variant = BINARY
+        elif sub.analytics and analytics is not None:
+            variant = "analytics"
+        else:
+            variant = JSON
+        frame = cache.get(variant)
+        if frame is None:
+            if variant == BINARY:
+                frame = pack_tick(self.symbol_id(key), seq, ts_ns, price)
+            elif variant == JSON:
+                frame = encode(payload)
+            else:
+                frame = encode({**payload, "analytics": analytics()})
+            cache[variant] = frame
+        return frame
+
+    def publish_event(self, key: str, payload: Dict[str, Any]) -> int:
+        """Queue a JSON event for explicit subscribers of ``key`` (``"*"`` does not match)."""
+        targets = list(self._by_symbol.get(key, ()))
+        if not targets:
+            return 0
+        text = encode(payload)
+        delivered = 0
+        for sub in targets:
+            if sub.closed:
+                self.unsubscribe(sub)
+            elif sub.offer(key, text, coalesce=False):
+                delivered += 1
+            else:
+                self.evict(sub)
+        return delivered
+
+    def evict(self, sub: Subscriber) -> None:
+        logger.warning("Evicting slow subscriber %s (%s queued)", sub.id, len(sub._queue))
+        self.evicted += 1
+        sub.evicted = True
+        self.unsubscribe(sub)
+
+    def stats(self) -> Dict[str, Any]:
+        subs: List[Dict[str, Any]] = [s.stats() for s in self.subscribers.values()]
+        return {
+            "subscribers": len(subs),
+            "policy": self.policy,
+            "max_queue": self.max_queue,
+            "evicted": self.evicted,
+            "symbols": {symbol: len(subs) for symbol, subs in self._by_symbol.items()},
+            "max_lag_ms": max((s["lag_ms"] for s in subs), default=0.0),
+            "clients": subs,
+        }
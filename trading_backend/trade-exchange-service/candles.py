@@ -0,0 +1,127 @@
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+# Bar widths served by /candles
+INTERVALS = {"1m": 60, "5m": 300, "1h": 3600, "1d": 86400}
+
+# Number of bars retained per (symbol, interval). Each costs 96 bytes (start, OHLC
+# and count, stored twice) in each of the four intervals, so the default is about
+# 770 KB per symbol: 33 hours of 1m bars, a week of 5m, 83 days of 1h, 5 years of 1d
+CANDLE_DEPTH = int(os.getenv("CANDLE_DEPTH", "2000"))
+
+COLUMNS = ("open", "high", "low", "close")
+
+
+class CandleSeries:
+    """OHLC + tick-count bars for one symbol at one interval, updated per tick.
+
+    Uses the same mirrored layout as ``PriceRingBuffer``: each bar lives at
+    ``i`` and ``i + capacity``, so the retained bars are one contiguous slice
+    and queries return views. Ticks older than the current bar are ignored.
+    """
+
+    def __init__(self, interval_s: int, capacity: int = CANDLE_DEPTH):
+        self.interval_ns = interval_s * 1_000_000_000
+        self.capacity = capacity
+        self.start = np.zeros(2 * capacity, dtype=np.int64)
+        self.ohlc = np.zeros((len(COLUMNS), 2 * capacity), dtype=np.float64)
+        self.count = np.zeros(2 * capacity, dtype=np.int64)
+        self._head = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def update(self, ts_ns: int, price: float) -> None:
+        bucket = ts_ns - ts_ns % self.interval_ns
+        cur = (self._head - 1) % self.capacity
+        if self._size and bucket == self.start[cur]:
+            o, h, l, _ = self.ohlc[:, cur]
+            bar = (o, max(h, price), min(l, price), price)
+            count = self.count[cur] + 1
+        elif self._size and bucket < self.start[cur]:
+            return
+        else:
+            cur = self._head
+            self._head = (self._head + 1) % self.capacity
+            if self._size < self.capacity:
+                self._size += 1
+            self.start[cur] = self.start[cur + self.capacity] = bucket
+            bar = (price, price, price, price)
+            count = 1
+        self.ohlc[:, cur] = self.ohlc[:, cur + self.capacity] = bar
+        self.count[cur] = self.count[cur + self.capacity] = count
+
+    def load(self, ts_ns: np.ndarray, prices: np.ndarray) -> None:
+        """Build bars from a sorted tick history in one vectorized pass (empty series only)."""
+        if self._size:
+            raise RuntimeError("load() is only supported on an empty series")
+        if not len(ts_ns):
+            return
+        buckets = ts_ns - ts_ns % self.interval_ns
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(ts_ns)]
+        bars = np.vstack([
+            prices[starts],
+            np.maximum.reduceat(prices, starts),
+            np.minimum.reduceat(prices, starts),
+            prices[ends - 1],
+        ])
+        keep = slice(max(len(starts) - self.capacity, 0), None)
+        bucket_starts, bars, counts = buckets[starts][keep], bars[:, keep], (ends - starts)[keep]
+        n = len(counts)
+        for offset in (0, self.capacity):
+            self.start[offset:offset + n] = bucket_starts
+            self.ohlc[:, offset:offset + n] = bars
+            self.count[offset:offset + n] = counts
+        self._head = n % self.capacity
+        self._size = n
+
+    def window(
+        self,
+        since_ns: Optional[int] = None,
+        until_ns: Optional[int] = None,
+        last_n: Optional[int] = None,
+    ) -> Dict[str, np.ndarray]:
+        """Views of bars starting in ``[since_ns, until_ns]``, trimmed to the newest ``last_n``."""
+        end = self._head if self._size < self.capacity else self._head + self.capacity
+        start = end - self._size
+        starts = self.start[start:end]
+        lo, hi = 0, len(starts)
+        if since_ns is not None:
+            lo = int(np.searchsorted(starts, since_ns, side="left"))
+        if until_ns is not None:
+            hi = int(np.searchsorted(starts, until_ns, side="right"))
+        if last_n is not None:
+            lo = max(lo, hi - last_n)
+        hi = max(lo, hi)
+        bars = {"timestamp": starts[lo:hi], "count": self.count[start:end][lo:hi]}
+        for i, name in enumerate(COLUMNS):
+            bars[name] = self.ohlc[i, start:end][lo:hi]
+        return bars
+
+
+class CandleStore:
+    """Per-symbol candle series for every interval in ``INTERVALS``."""
+
+    def __init__(self, capacity: int = CANDLE_DEPTH):
+        self.capacity = capacity
+        self._series: Dict[str, Dict[str, CandleSeries]] = {}
+
+    def update(self, key: str, ts_ns: int, price: float) -> None:
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = {name: CandleSeries(s, self.capacity) for name, s in INTERVALS.items()}
+        for s in series.values():
+            s.update(ts_ns, price)
+
+    def load(self, key: str, ts_ns: np.ndarray, prices: np.ndarray) -> None:
+        self._series[key] = {name: CandleSeries(s, self.capacity) for name, s in INTERVALS.items()}
+        for series in self._series[key].values():
+            series.load(ts_ns, prices)
+
+    def get(self, key: str, interval: str) -> Optional[CandleSeries]:
+        series = self._series.get(key)
+        return series[interval] if series else None
@@ -0,0 +1,205 @@
+import asyncio
+import csv
+import json
+import logging
+import math
+import os
+import random
+from datetime import datetime
+from typing import AsyncIterator, Iterator, List, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+
+from price_history import now_ns, to_epoch_ns
+
+logger = logging.getLogger("trade_exchange.feeds")
+
+# (country, commodity, epoch ns, price)
+Tick = Tuple[str, str, int, float]
+Symbol = Tuple[str, str]
+
+PRICE_FEED = os.getenv("PRICE_FEED", "demo")
+FEED_SYMBOLS = int(os.getenv("FEED_SYMBOLS", "100"))
+FEED_TICK_RATE = float(os.getenv("FEED_TICK_RATE", "1000"))
+FEED_BATCH_INTERVAL = float(os.getenv("FEED_BATCH_INTERVAL", "0.05"))
+FEED_VOLATILITY = float(os.getenv("FEED_VOLATILITY", "0.3"))
+FEED_DRIFT = float(os.getenv("FEED_DRIFT", "0.0"))
+FEED_REPLAY_PATH = os.getenv("FEED_REPLAY_PATH")
+FEED_REPLAY_SPEED = float(os.getenv("FEED_REPLAY_SPEED", "1.0"))
+FEED_REPLAY_LOOP = os.getenv("FEED_REPLAY_LOOP", "false").lower() == "true"
+
+SECONDS_PER_YEAR = 365 * 86400
+
+
+class PriceFeed(Protocol):
+    def batches(self) -> AsyncIterator[List[Tick]]:
+        """Yield batches of ticks, oldest first, pacing itself in real time."""
+        ...
+
+
+def demo_price(commodity: str) -> float:
+    return round(random.uniform(5, 10), 2) if commodity == "wheat" else round(random.uniform(2000, 2500), 2)
+
+
+class DemoFeed:
+    """One random price per symbol every ``interval`` seconds (the original behaviour)."""
+
+    def __init__(self, symbols: Sequence[Symbol], interval: float = 10.0):
+        self.symbols = list(symbols)
+        self.interval = interval
+
+    async def batches(self) -> AsyncIterator[List[Tick]]:
+        while True:
+            ts = now_ns()
+            yield [(country, commodity, ts, demo_price(commodity)) for country, commodity in self.symbols]
+            await asyncio.sleep(self.interval)
+
+
+class SyntheticFeed:
+    """Geometric Brownian motion prices for many symbols at a fixed aggregate tick rate.
+
+    Every ``batch_interval`` seconds it emits ``tick_rate * batch_interval`` ticks,
+    visiting symbols round-robin, with all price steps for the batch drawn in one
+    vectorized pass.
+    """
+
+    def __init__(
+        self,
+        symbols: Sequence[Symbol],
+        tick_rate: float = FEED_TICK_RATE,
+        batch_interval: float = FEED_BATCH_INTERVAL,
+        volatility: float = FEED_VOLATILITY,
+        drift: float = FEED_DRIFT,
+        seed: Optional[int] = None,
+    ):
+        self.symbols = list(symbols)
+        self.tick_rate = tick_rate
+        self.batch_interval = batch_interval
+        self.volatility = volatility
+        self.drift = drift
+        self.rng = np.random.default_rng(seed)
+        self.prices = np.array([demo_price(commodity) for _, commodity in self.symbols])
+        self._cursor = 0
+
+    def _step(self, n: int, elapsed: float) -> Tuple[np.ndarray, np.ndarray]:
+        idx = (self._cursor + np.arange(n)) % len(self.symbols)
+        self._cursor = (self._cursor + n) % len(self.symbols)
+        # Each symbol moves by the time since its previous tick in this round-robin
+        dt = max(elapsed * len(self.symbols) / max(n, 1), 1e-9) / SECONDS_PER_YEAR
+        shocks = self.rng.standard_normal(n)
+        growth = np.exp((self.drift - 0.5 * self.volatility ** 2) * dt + self.volatility * math.sqrt(dt) * shocks)
+        out = np.empty(n)
+        # Each chunk of len(symbols) consecutive ticks touches every symbol at most once
+        for lo in range(0, n, len(self.symbols)):
+            chunk = idx[lo:lo + len(self.symbols)]
+            self.prices[chunk] *= growth[lo:lo + len(self.symbols)]
+            out[lo:lo + len(chunk)] = self.prices[chunk]
+        return idx, np.round(out, 4)
+
+    async def batches(self) -> AsyncIterator[List[Tick]]:
+        loop = asyncio.get_running_loop()
+        per_batch = self.tick_rate * self.batch_interval
+        carry = 0.0
+        deadline = loop.time()
+        while True:
+            carry += per_batch
+            n = int(carry)
+            carry -= n
+            if n:
+                idx, prices = self._step(n, self.batch_interval)
+                ts = now_ns()
+                yield [(*self.symbols[i], ts, p) for i, p in zip(idx.tolist(), prices.tolist())]
+            deadline += self.batch_interval
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Running behind: yield to the loop but don't try to catch up in a burst
+                deadline = loop.time()
+                await asyncio.sleep(0)
+
+
+def _parse_timestamp(value) -> int:
+    """Epoch seconds/ms/ns (by magnitude) or an ISO string, to epoch ns."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return to_epoch_ns(datetime.fromisoformat(str(value)))
+    if number > 1e17:
+        return int(number)
+    if number > 1e11:
+        return int(number * 1_000_000)
+    return int(number * 1_000_000_000)
+
+
+def read_recorded_ticks(path: str) -> Iterator[Tick]:
+    """Stream ticks from a CSV (with a header) or NDJSON file of country, commodity, timestamp, price."""
+    with open(path, newline="") as f:
+        if path.endswith((".ndjson", ".jsonl")):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            try:
+                yield row["country"].upper(), row["commodity"].lower(), _parse_timestamp(row["timestamp"]), float(row["price"])
+            except (KeyError, ValueError, AttributeError) as e:
+                logger.warning("Skipping bad replay row %r: %s", row, e)
+
+
+class ReplayFeed:
+    """Replays recorded ticks, preserving their spacing divided by ``speed``.
+
+    ``speed`` 1.0 is real time, 10.0 is ten times faster and 0 replays as fast
+    as the ingest loop can take it. Ticks are re-stamped with the time they
+    are emitted so history stays monotonic across loops.
+    """
+
+    def __init__(self, path: str, speed: float = FEED_REPLAY_SPEED, loop: bool = FEED_REPLAY_LOOP, max_batch: int = 1000):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.max_batch = max_batch
+
+    async def batches(self) -> AsyncIterator[List[Tick]]:
+        clock = asyncio.get_running_loop()
+        while True:
+            first_ts: Optional[int] = None
+            started = clock.time()
+            batch: List[Tick] = []
+            for country, commodity, ts, price in read_recorded_ticks(self.path):
+                if first_ts is None:
+                    first_ts = ts
+                if self.speed > 0:
+                    delay = started + (ts - first_ts) / 1e9 / self.speed - clock.time()
+                    if delay > 0:
+                        if batch:
+                            yield batch
+                            batch = []
+                        await asyncio.sleep(delay)
+                batch.append((country, commodity, now_ns(), price))
+                if len(batch) >= self.max_batch:
+                    yield batch
+                    batch = []
+                    await asyncio.sleep(0)
+            if batch:
+                yield batch
+            if not self.loop or first_ts is None:
+                logger.info("Replay of %s finished", self.path)
+                return
+
+
+def synthetic_symbols(base: Sequence[Symbol], count: int) -> List[Symbol]:
+    """The real symbols first, padded with ``SY:synthN`` up to ``count``."""
+    symbols = list(base)[:count]
+    symbols += [("SY", f"synth{i}") for i in range(max(count - len(symbols), 0))]
+    return symbols
+
+
+def feed_from_env(symbols: Sequence[Symbol]) -> PriceFeed:
+    if PRICE_FEED == "synthetic":
+        return SyntheticFeed(synthetic_symbols(symbols, FEED_SYMBOLS))
+    if PRICE_FEED == "replay":
+        if not FEED_REPLAY_PATH:
+            raise RuntimeError("PRICE_FEED=replay requires FEED_REPLAY_PATH")
+        return ReplayFeed(FEED_REPLAY_PATH)
+    return DemoFeed(symbols)
@@ -0,0 +1,237 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable, Optional, Protocol, Sequence, Tuple
+
+import httpx
+import numpy as np
+
+logger = logging.getLogger("trade_exchange.fx_rates")
+
+TWELVE_DATA_API_KEY = os.getenv("TWELVE_DATA_API_KEY", "your-twelve-data-api-key")
+TWELVE_DATA_CURRENCIES_URL = "https://api.twelvedata.com/currencies"
+
+FX_PROVIDER = os.getenv("FX_PROVIDER", "twelvedata")
+FX_FIXTURE_PATH = os.getenv("FX_FIXTURE_PATH")
+FX_RATES_TTL = float(os.getenv("FX_RATES_TTL", "60"))
+# Minimum gap between upstream attempts after a failure
+FX_RETRY_AFTER = float(os.getenv("FX_RETRY_AFTER", "5"))
+
+# Currency used to triangulate pairs with no direct or inverse quote
+PIVOT_CURRENCY = "USD"
+
+# Served when the upstream has never answered (USD-based demo data)
+DEMO_RATES = {"USD": 1.0, "INR": 83.0, "EUR": 0.92, "GBP": 0.78}
+
+Quote = Tuple[str, str, float]
+
+
+class RateProvider(Protocol):
+    name: str
+
+    async def fetch(self) -> Iterable[Quote]:
+        """Return ``(base, quote, rate)`` triples."""
+        ...
+
+    async def aclose(self) -> None:
+        ...
+
+
+class TwelveDataProvider:
+    name = "twelvedata"
+
+    def __init__(self, api_key: str = TWELVE_DATA_API_KEY, timeout: float = 10.0):
+        self.api_key = api_key
+        self._client = httpx.AsyncClient(timeout=timeout)
+
+    async def fetch(self) -> Iterable[Quote]:
+        resp = await self._client.get(TWELVE_DATA_CURRENCIES_URL, params={"apikey": self.api_key})
+        resp.raise_for_status()
+        data = resp.json()
+        quotes = []
+        for item in data.get("data", []):
+            try:
+                quotes.append((item["currency_base"].upper(), item["currency_quote"].upper(), float(item["close"])))
+            except (KeyError, TypeError, ValueError):
+                continue
+        if not quotes:
+            raise ValueError("Twelve Data returned no usable quotes")
+        return quotes
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class FixtureProvider:
+    """Serves rates from a dict or a JSON file of ``{base: {quote: rate}}``."""
+
+    name = "fixture"
+
+    def __init__(self, rates: Optional[Dict[str, Dict[str, float]]] = None, path: Optional[str] = None):
+        if rates is None and path is None:
+            rates = {"USD": DEMO_RATES}
+        self.rates = rates
+        self.path = path
+
+    async def fetch(self) -> Iterable[Quote]:
+        rates = self.rates
+        if self.path is not None:
+            with open(self.path) as f:
+                rates = json.load(f)
+        return [(base.upper(), quote.upper(), float(rate)) for base, quotes in rates.items() for quote, rate in quotes.items()]
+
+    async def aclose(self) -> None:
+        pass
+
+
+class RateTable:
+    """Immutable snapshot of quotes indexed by base currency."""
+
+    def __init__(self, quotes: Iterable[Quote], source: str, fetched_at: float):
+        self.by_base: Dict[str, Dict[str, float]] = {}
+        for base, quote, rate in quotes:
+            self.by_base.setdefault(base, {})[quote] = rate
+        self.source = source
+        self.fetched_at = fetched_at
+        self._matrix: Optional[np.ndarray] = None
+        self._index: Dict[str, int] = {}
+
+    def rates_for(self, base: str) -> Dict[str, float]:
+        return self.by_base.get(base.upper(), {})
+
+    def cross_rates(self) -> Tuple[np.ndarray, Dict[str, int]]:
+        """Cross-rate matrix ``m[i, j]`` (units of j per unit of i) and its currency index.
+
+        Built once per snapshot from direct quotes, then inverses, then
+        triangulation through PIVOT_CURRENCY; unknown pairs are NaN.
+        """
+        if self._matrix is None:
+            currencies = sorted({c for base, quotes in self.by_base.items() for c in (base, *quotes)} | {PIVOT_CURRENCY})
+            index = {c: i for i, c in enumerate(currencies)}
+            m = np.full((len(currencies), len(currencies)), np.nan)
+            for base, quotes in self.by_base.items():
+                for quote, rate in quotes.items():
+                    m[index[base], index[quote]] = rate
+            with np.errstate(divide="ignore"):
+                inverse = 1.0 / m.T
+            inverse[~np.isfinite(inverse)] = np.nan
+            m = np.where(np.isnan(m), inverse, m)
+            p = index[PIVOT_CURRENCY]
+            via_pivot = m[:, p, None] * m[None, p, :]
+            m = np.where(np.isnan(m), via_pivot, m)
+            np.fill_diagonal(m, 1.0)
+            self._matrix, self._index = m, index
+        return self._matrix, self._index
+
+    def rate(self, from_: str, to: str) -> Optional[float]:
+        m, index = self.cross_rates()
+        i, j = index.get(from_.upper()), index.get(to.upper())
+        if i is None or j is None or np.isnan(m[i, j]):
+            return None
+        return float(m[i, j])
+
+    def convert_many(self, from_: Sequence[str], to: Sequence[str], amounts: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectorized conversion; returns ``(converted, rate)`` with NaN for unknown pairs."""
+        m, index = self.cross_rates()
+        fi = self._indices(from_, index)
+        ti = self._indices(to, index)
+        known = (fi >= 0) & (ti >= 0)
+        rates = np.full(len(fi), np.nan)
+        rates[known] = m[fi[known], ti[known]]
+        return np.asarray(amounts, dtype=np.float64) * rates, rates
+
+    @staticmethod
+    def _indices(codes: Sequence[str], index: Dict[str, int]) -> np.ndarray:
+        # Resolve each distinct code once, then scatter back over the column
+        unique, inverse = np.unique(np.asarray(codes, dtype=str), return_inverse=True)
+        lookup = np.array([index.get(c.upper(), -1) for c in unique], dtype=np.intp)
+        return lookup[inverse] if len(unique) else np.empty(0, dtype=np.intp)
+
+
+class RateCache:
+    """TTL cache of the rate table with single-flight, stale-while-revalidate refresh.
+
+    Readers never wait on the upstream unless no table has been loaded yet; a
+    stale table is served while one refresh runs in the background, and a failed
+    refresh keeps the previous table.
+    """
+
+    def __init__(self, provider: RateProvider, ttl: float = FX_RATES_TTL, retry_after: float = FX_RETRY_AFTER):
+        self.provider = provider
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self.table: Optional[RateTable] = None
+        self.last_error: Optional[str] = None
+        self._last_attempt = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+        self._refresher: Optional[asyncio.Task] = None
+
+    def is_fresh(self) -> bool:
+        return self.table is not None and time.time() - self.table.fetched_at < self.ttl
+
+    async def get_table(self) -> RateTable:
+        if self.table is None:
+            return await self.refresh()
+        if not self.is_fresh() and time.monotonic() - self._last_attempt >= self.retry_after:
+            self._start_refresh()
+        return self.table
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._refresh())
+        return self._inflight
+
+    async def refresh(self) -> RateTable:
+        """Refresh now, joining any refresh already in flight."""
+        return await asyncio.shield(self._start_refresh())
+
+    async def _refresh(self) -> RateTable:
+        self._last_attempt = time.monotonic()
+        try:
+            quotes = await self.provider.fetch()
+            self.table = RateTable(quotes, self.provider.name, time.time())
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            logger.warning("FX refresh from %s failed: %s", self.provider.name, e)
+            if self.table is None:
+                # Nothing to serve stale; fall back to demo rates, already expired so they get replaced
+                self.table = RateTable((("USD", q, r) for q, r in DEMO_RATES.items()), "fallback", 0.0)
+        return self.table
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("FX background refresh crashed")
+            await asyncio.sleep(self.ttl)
+
+    def start(self) -> None:
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+        await self.provider.aclose()
+
+    def status(self) -> dict:
+        table = self.table
+        return {
+            "provider": self.provider.name,
+            "source": table.source if table else None,
+            "fetched_at": table.fetched_at if table else None,
+            "fresh": self.is_fresh(),
+            "ttl": self.ttl,
+            "last_error": self.last_error,
+        }
+
+
+def provider_from_env() -> RateProvider:
+    if FX_PROVIDER == "fixture":
+        return FixtureProvider(path=FX_FIXTURE_PATH)
+    return TwelveDataProvider()
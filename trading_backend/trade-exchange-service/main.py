@@ -1,19 +1,54 @@
 
 
-from fastapi import FastAPI, Query, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, Field
 from typing import Dict, Optional, List
-# import httpx
 import os
+import json
+import logging
 import asyncio
+import numpy as np
 from datetime import datetime
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+
+from analytics import ANALYTICS_EMA_SPANS, ANALYTICS_VOL_WINDOW, ANALYTICS_WINDOWS, AnalyticsStore
+from broadcast import ALL_SYMBOLS, ENCODINGS, MAX_BATCH, BroadcastHub, POLICIES, normalize_symbol, symbol_key
+from candles import CandleStore, INTERVALS
+from feeds import feed_from_env
+from fx_rates import DEMO_RATES, RateCache, provider_from_env
+from order_book import GTC, MatchingEngine, OrderError
+from price_history import PriceHistory, iso_timestamps, to_epoch_ns
+from tick_log import tick_log_from_env
 
 app = FastAPI()
 
-# In-memory price history: {(country, commodity): [ {"timestamp": ..., "price": ...}, ... ]}
-PRICE_HISTORY: Dict[str, List[dict]] = {}
+# In-memory price history: {"COUNTRY:commodity": PriceRingBuffer} with timestamp + price columns
+PRICE_HISTORY = PriceHistory()
+
+# Append-only memory-mapped tick log under TICK_LOG_DIR (empty disables it); survives restarts
+TICK_LOG = tick_log_from_env()
+
+# How often retention/compaction runs over the tick log
+TICK_LOG_MAINTENANCE_INTERVAL = 3600
+
+# OHLC + tick-count bars at every interval in candles.INTERVALS, updated as ticks arrive
+CANDLES = CandleStore()
+
+# Rolling SMA/EMA/stddev/min/max/volatility per symbol, O(1) per tick
+ANALYTICS = AnalyticsStore()
 
-TWELVE_DATA_API_KEY = os.getenv("TWELVE_DATA_API_KEY", "your-twelve-data-api-key")
+# Limit order books per commodity; trades are published on the price socket as TRADES:<commodity>
+ENGINE = MatchingEngine()
+
+# Widest gap replayed tick-by-tick to a resuming client; wider gaps get a snapshot
+RESUME_MAX_DELTAS = int(os.getenv("RESUME_MAX_DELTAS", "1000"))
+
+# Window returned by /prices and /candles when no range is requested
+DEFAULT_PRICE_WINDOW = 100
+
+# FX rate table, refreshed in the background every FX_RATES_TTL seconds (provider from FX_PROVIDER)
+FX_CACHE = RateCache(provider_from_env())
 
 COUNTRY_COMMODITY_MAP = {
     ("IN", "wheat"): {"symbol": "WHEAT/USD"},
@@ -22,93 +57,343 @@ COUNTRY_COMMODITY_MAP = {
     ("US", "gold"): {"symbol": "XAU/USD"},
 }
 
-subscribers: List[WebSocket] = []
+# Price fan-out; queue depth and slow-consumer policy come from WS_QUEUE_SIZE / WS_SLOW_CONSUMER_POLICY
+HUB = BroadcastHub()
+
+# Tick source, chosen by PRICE_FEED: demo (default), synthetic or replay
+FEED = feed_from_env(list(COUNTRY_COMMODITY_MAP))
+FEED_STATS = {"source": type(FEED).__name__, "ticks": 0, "batches": 0}
+
+def ingest_tick(country: str, commodity: str, ts_ns: int, price: float, timestamp: str):
+    key = f"{country}:{commodity}"
+    seq = PRICE_HISTORY.append(key, ts_ns, price)
+    CANDLES.update(key, ts_ns, price)
+    stats = ANALYTICS.update(key, ts_ns, price)
+    if TICK_LOG is not None:
+        TICK_LOG.append(key, ts_ns, price, seq)
+    # Notify subscribers
+    payload = {"country": country, "commodity": commodity, "price": price, "timestamp": timestamp, "seq": seq}
+    HUB.publish(key, payload, ts_ns, price, seq, stats.snapshot)
 
 async def fetch_and_store_prices():
+    async for batch in FEED.batches():
+        timestamps = iso_timestamps(np.fromiter((t[2] for t in batch), dtype=np.int64, count=len(batch)))
+        for (country, commodity, ts_ns, price), timestamp in zip(batch, timestamps):
+            ingest_tick(country, commodity, ts_ns, price, timestamp)
+        if TICK_LOG is not None:
+            TICK_LOG.flush()
+        FEED_STATS["ticks"] += len(batch)
+        FEED_STATS["batches"] += 1
+
+def recover_history():
+    """Reload the newest ticks per symbol from the tick log instead of replaying it all."""
+    for key in TICK_LOG.keys():
+        ts, prices, seqs = TICK_LOG.tail(key, PRICE_HISTORY.capacity)
+        if len(ts):
+            # Sequence numbers carry on from the log, so clients can resume across restarts
+            PRICE_HISTORY.extend(key, ts, prices, seqs)
+            CANDLES.load(key, ts, prices)
+            # Rolling windows only need their own length of history
+            warmup = max(ANALYTICS_WINDOWS + ANALYTICS_EMA_SPANS + [ANALYTICS_VOL_WINDOW + 1])
+            for t, p in zip(ts[-warmup:].tolist(), prices[-warmup:].tolist()):
+                ANALYTICS.update(key, t, p)
+
+async def maintain_tick_log():
     while True:
-        for (country, commodity), meta in COUNTRY_COMMODITY_MAP.items():
-            # For demo, generate random price
-            import random
-            price = round(random.uniform(5, 10), 2) if commodity == "wheat" else round(random.uniform(2000, 2500), 2)
-            entry = {"timestamp": datetime.utcnow().isoformat(), "price": price}
-            key = f"{country}:{commodity}"
-            PRICE_HISTORY.setdefault(key, []).append(entry)
-            # Keep only last 100 entries
-            PRICE_HISTORY[key] = PRICE_HISTORY[key][-100:]
-            # Notify subscribers
-            for ws in subscribers:
-                try:
-                    asyncio.create_task(ws.send_json({"country": country, "commodity": commodity, "price": price, "timestamp": entry["timestamp"]}))
-                except Exception:
-                    pass
-        await asyncio.sleep(10)  # fetch every 10 seconds
+        try:
+            await asyncio.to_thread(TICK_LOG.enforce_retention)
+        except Exception:
+            logging.exception("Tick log maintenance failed")
+        await asyncio.sleep(TICK_LOG_MAINTENANCE_INTERVAL)
 
 @app.on_event("startup")
 async def startup_event():
+    if TICK_LOG is not None:
+        await asyncio.to_thread(recover_history)
+        asyncio.create_task(maintain_tick_log())
     asyncio.create_task(fetch_and_store_prices())
+    FX_CACHE.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await FX_CACHE.stop()
+    if TICK_LOG is not None:
+        TICK_LOG.close()
 
 @app.get("/")
 def root():
     return {"message": "Trade Exchange Service running!"}
 
+@app.get("/feed/stats")
+def get_feed_stats():
+    return FEED_STATS
+
+# The history, analytics, candle and hub state below is mutated by the ingest loop, so
+# these handlers read it on the loop too; only the mmap'd tick log read is offloaded.
 @app.get("/prices")
-def get_prices(country: str, commodity: str):
+async def get_prices(
+    country: str,
+    commodity: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    last_n: Optional[int] = Query(None, ge=1),
+    columnar: bool = False,
+):
     key = f"{country.upper()}:{commodity.lower()}"
-    return PRICE_HISTORY.get(key, [])
+    buf = PRICE_HISTORY.get(key)
+    if since is None and until is None and last_n is None:
+        last_n = DEFAULT_PRICE_WINDOW
+    since_ns = to_epoch_ns(since) if since else None
+    until_ns = to_epoch_ns(until) if until else None
+    if TICK_LOG is not None and since_ns is not None and (not buf or since_ns < buf.columns()[0][0]):
+        # Older than the in-memory window: read straight from the memory-mapped log
+        ts, prices, seqs = await run_in_threadpool(TICK_LOG.read, key, since_ns, until_ns)
+        if last_n is not None:
+            ts, prices, seqs = ts[-last_n:], prices[-last_n:], seqs[-last_n:]
+    elif buf is None:
+        return {"timestamp": [], "price": [], "seq": []} if columnar else []
+    else:
+        ts, prices, seqs = buf.window(since_ns=since_ns, until_ns=until_ns, last_n=last_n)
+    timestamps = iso_timestamps(ts)
+    if columnar:
+        return {"timestamp": timestamps, "price": prices.tolist(), "seq": seqs.tolist()}
+    return [{"timestamp": t, "price": p, "seq": q} for t, p, q in zip(timestamps, prices.tolist(), seqs.tolist())]
+
+def replay_missed(sub, key: str, since_seq: int) -> None:
+    """Queue the ticks after ``since_seq`` from the history buffer, or a snapshot if that's not possible.
+
+    A snapshot is sent when the gap is wider than RESUME_MAX_DELTAS (or the
+    socket's queue), reaches past the buffer, or ``since_seq`` is unknown here.
+    """
+    buf = PRICE_HISTORY.get(key)
+    if buf is None:
+        return
+    missed = buf.after_seq(since_seq)
+    if missed is not None and len(missed[0]) <= min(RESUME_MAX_DELTAS, sub.max_queue // 2):
+        ts, prices, seqs = missed
+        country, commodity = key.split(":", 1)
+        for t, p, q, iso in zip(ts.tolist(), prices.tolist(), seqs.tolist(), iso_timestamps(ts)):
+            payload = {"country": country, "commodity": commodity, "price": p, "timestamp": iso, "seq": q}
+            if not HUB.send_to(sub, key, payload, t, p, q):
+                return
+        return
+    ts, price, seq = buf.last()
+    country, commodity = key.split(":", 1)
+    sub.send_control({
+        "type": "snapshot",
+        "country": country,
+        "commodity": commodity,
+        "seq": seq,
+        "oldest_seq": int(buf.columns()[2][0]),
+        "price": price,
+        "timestamp": iso_timestamps(np.array([ts]))[0],
+    })
+
+def handle_subscription_message(sub, text: str) -> None:
+    """Apply a client control message.
+
+    Clients send ``{"action": "subscribe" | "unsubscribe", "symbols": ["IN:wheat", ...]}``
+    (or ``"country"``/``"commodity"`` for a single symbol, ``"*"`` for every price symbol,
+    ``"TRADES:<commodity>"`` for that order book's trades)
+    and get back ``{"type": "subscriptions", "symbols": [...]}``. A reconnecting
+    client adds ``"since": {"IN:wheat": <last seq seen>}`` (``"since_seq"`` with
+    country/commodity) to have the missed ticks replayed first.
+    """
+    try:
+        msg = json.loads(text)
+        action = msg.get("action")
+        if action not in ("subscribe", "unsubscribe"):
+            raise ValueError("action must be 'subscribe' or 'unsubscribe'")
+        symbols = msg.get("symbols")
+        since = msg.get("since") or {}
+        if symbols is None:
+            symbol = symbol_key(msg["country"], msg["commodity"])
+            symbols = [symbol]
+            if msg.get("since_seq") is not None:
+                since = {symbol: msg["since_seq"]}
+        symbols = [normalize_symbol(s) for s in symbols]
+        since = {normalize_symbol(s): int(seq) for s, seq in since.items()}
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        sub.send_control({"type": "error", "detail": str(e)})
+        return
+    if action == "subscribe":
+        for symbol, seq in since.items():
+            replay_missed(sub, symbol, seq)
+        HUB.add_symbols(sub, symbols)
+    else:
+        HUB.remove_symbols(sub, symbols)
+    sub.send_control({"type": "subscriptions", "symbols": sorted(sub.symbols)})
+
+@app.get("/analytics")
+async def get_analytics(country: str, commodity: str):
+    key = f"{country.upper()}:{commodity.lower()}"
+    stats = ANALYTICS.get(key)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="No ticks for this symbol yet")
+    return {"country": country.upper(), "commodity": commodity.lower(), **stats.snapshot()}
+
+@app.get("/candles")
+async def get_candles(
+    country: str,
+    commodity: str,
+    interval: str = Query("1m", pattern=f"^({'|'.join(INTERVALS)})$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    last_n: Optional[int] = Query(None, ge=1),
+    columnar: bool = False,
+):
+    key = f"{country.upper()}:{commodity.lower()}"
+    series = CANDLES.get(key, interval)
+    if series is None:
+        return {"timestamp": [], "open": [], "high": [], "low": [], "close": [], "count": []} if columnar else []
+    if since is None and until is None and last_n is None:
+        last_n = DEFAULT_PRICE_WINDOW
+    bars = series.window(
+        since_ns=to_epoch_ns(since) if since else None,
+        until_ns=to_epoch_ns(until) if until else None,
+        last_n=last_n,
+    )
+    columns = {"timestamp": iso_timestamps(bars.pop("timestamp"))}
+    columns.update((name, col.tolist()) for name, col in bars.items())
+    if columnar:
+        return columns
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
 
 @app.websocket("/ws/prices")
-async def websocket_prices(ws: WebSocket):
+async def websocket_prices(
+    ws: WebSocket,
+    policy: Optional[str] = None,
+    country: Optional[str] = None,
+    commodity: Optional[str] = None,
+    encoding: str = "json",
+    batch: int = 1,
+    analytics: bool = False,
+    since_seq: Optional[int] = None,
+):
+    if policy is not None and policy not in POLICIES:
+        await ws.close(code=1008, reason=f"policy must be one of {', '.join(POLICIES)}")
+        return
+    if encoding not in ENCODINGS or not 1 <= batch <= MAX_BATCH:
+        await ws.close(code=1008, reason=f"encoding must be one of {', '.join(ENCODINGS)}, batch 1-{MAX_BATCH}")
+        return
     await ws.accept()
-    subscribers.append(ws)
+    # Without a country/commodity the socket starts subscribed to every symbol, as before
+    initial = [symbol_key(country, commodity)] if country and commodity else [ALL_SYMBOLS]
+    sub = HUB.subscribe(ws, policy=policy, encoding=encoding, batch=batch, analytics=analytics)
+    if since_seq is not None and initial[0] != ALL_SYMBOLS:
+        # Reconnect: missed ticks (or a snapshot) are queued ahead of live ones
+        replay_missed(sub, initial[0], since_seq)
+    HUB.add_symbols(sub, initial)
+    writer = asyncio.create_task(sub.run())
     try:
         while True:
-            await ws.receive_text()  # keep connection open
-    except WebSocketDisconnect:
-        subscribers.remove(ws)
+            handle_subscription_message(sub, await ws.receive_text())
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        HUB.unsubscribe(sub)
+        writer.cancel()
+
+@app.get("/ws/prices/symbols")
+async def websocket_prices_symbols():
+    """Symbol ids used by ``encoding=binary`` frames."""
+    return HUB.symbol_ids
+
+@app.get("/ws/prices/stats")
+async def websocket_prices_stats():
+    return HUB.stats()
 
 @app.get("/rates")
 async def get_currency_rates(base: str = Query("USD")) -> Dict[str, float]:
-    # Fetch live rates from Twelve Data
-    url = f"https://api.twelvedata.com/currencies?apikey={TWELVE_DATA_API_KEY}"
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(url)
-        data = resp.json()
-    rates = {}
-    if "data" in data:
-        for item in data["data"]:
-            if item["currency_base"] == base.upper():
-                rates[item["currency_quote"]] = float(item["close"])
+    table = await FX_CACHE.get_table()
+    rates = table.rates_for(base)
     if not rates:
         # fallback demo data
-        rates = {"USD": 1.0, "INR": 83.0, "EUR": 0.92, "GBP": 0.78}
+        rates = dict(DEMO_RATES)
     return rates
 
+@app.get("/rates/status")
+def get_rates_status():
+    return FX_CACHE.status()
+
 
 # (Removed /commodities and /rules endpoints as COMMODITY_PRICES and TRADE_RULES are not defined)
 
 @app.get("/convert")
 async def convert_currency(from_: str = Query(..., alias="from"), to: str = Query(...), amount: float = Query(...)) -> dict:
-    # Fetch live rates from Twelve Data
-    url = f"https://api.twelvedata.com/currencies?apikey={TWELVE_DATA_API_KEY}"
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(url)
-        data = resp.json()
-    rates = {}
-    if "data" in data:
-        for item in data["data"]:
-            if item["currency_base"] == from_.upper():
-                rates[item["currency_quote"]] = float(item["close"])
-    from_rate = 1.0
-    to_rate = rates.get(to.upper())
-    if to_rate is None:
-        # fallback demo rates
-        fallback = {"USD": 1.0, "INR": 83.0, "EUR": 0.92, "GBP": 0.78}
-        to_rate = fallback.get(to.upper())
-        if to_rate is None:
-            return {"error": "Invalid currency code"}
-    converted = amount * to_rate
+    table = await FX_CACHE.get_table()
+    rate = table.rate(from_, to)
+    if rate is None:
+        return {"error": "Invalid currency code"}
+    converted = amount * rate
     return {"from": from_, "to": to, "amount": amount, "converted": converted}
 
+class BatchConvertRequest(BaseModel):
+    from_: List[str] = Field(..., alias="from")
+    to: List[str]
+    amount: List[float]
+
+
+@app.post("/convert/batch")
+async def convert_currency_batch(req: BatchConvertRequest) -> dict:
+    """Columnar conversion: ``converted[i]``/``rate[i]`` are null where the pair is unknown."""
+    if not (len(req.from_) == len(req.to) == len(req.amount)):
+        raise HTTPException(status_code=422, detail="from, to and amount must have the same length")
+    table = await FX_CACHE.get_table()
+    converted, rates = table.convert_many(req.from_, req.to, req.amount)
+    invalid = np.isnan(rates)
+    return {
+        "converted": np.where(invalid, None, converted).tolist(),
+        "rate": np.where(invalid, None, rates).tolist(),
+        "invalid": int(invalid.sum()),
+    }
+
+class OrderRequest(BaseModel):
+    commodity: str
+    side: str
+    price: float
+    quantity: float
+    owner: Optional[str] = None
+    time_in_force: str = GTC
+
+
+# The order handlers are async, with nothing to await, so they run one at a time on the event
+# loop: ENGINE is never touched from two threads and HUB's wakeups stay on the loop thread
+@app.post("/orders")
+async def submit_order(req: OrderRequest) -> dict:
+    commodity = req.commodity.lower()
+    try:
+        order, trades = ENGINE.submit(commodity, req.side.lower(), req.price, req.quantity, req.owner, req.time_in_force.upper())
+    except OrderError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    tick_size, lot_size = ENGINE.tick_size, ENGINE.lot_size
+    trade_dicts = [t.to_dict(tick_size, lot_size) for t in trades]
+    for trade in trade_dicts:
+        HUB.publish_event(f"TRADES:{commodity}", trade)
+    return {"order": order.to_dict(tick_size, lot_size), "trades": trade_dicts}
+
+
+@app.get("/orders/{order_id}")
+async def get_order(order_id: int) -> dict:
+    order = ENGINE.get(order_id)
+    if order is None:
+        raise HTTPException(status_code=404, detail="Order not found or no longer open")
+    return order.to_dict(ENGINE.tick_size, ENGINE.lot_size)
+
+
+@app.delete("/orders/{order_id}")
+async def cancel_order(order_id: int) -> dict:
+    order = ENGINE.cancel(order_id)
+    if order is None:
+        raise HTTPException(status_code=404, detail="Order not found or no longer open")
+    return order.to_dict(ENGINE.tick_size, ENGINE.lot_size)
+
+
+@app.get("/depth")
+async def get_depth(commodity: str, levels: int = Query(10, ge=1, le=1000)) -> dict:
+    return ENGINE.book(commodity.lower()).depth(levels)
+
 # Allow React frontend to talk to this API
 origins = [
     "http://localhost:3000",  # React dev server
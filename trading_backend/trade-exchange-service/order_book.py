@@ -0,0 +1,278 @@
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+BUY = "buy"
+SELL = "sell"
+SIDES = (BUY, SELL)
+GTC = "GTC"  # rest any unfilled quantity on the book
+IOC = "IOC"  # cancel any unfilled quantity
+TIME_IN_FORCE = (GTC, IOC)
+
+# Prices are matched as integer multiples of this tick
+ORDER_TICK_SIZE = float(os.getenv("ORDER_TICK_SIZE", "0.01"))
+# Quantities are matched as integer multiples of this lot, so fills never leave float dust
+ORDER_LOT_SIZE = float(os.getenv("ORDER_LOT_SIZE", "0.001"))
+
+OPEN = "open"
+FILLED = "filled"
+CANCELLED = "cancelled"
+
+
+class OrderError(ValueError):
+    pass
+
+
+class Order:
+    __slots__ = ("id", "commodity", "side", "ticks", "quantity", "remaining", "owner", "ts_ns", "status")
+
+    def __init__(self, order_id: int, commodity: str, side: str, ticks: int, quantity: int, owner: Optional[str], ts_ns: int):
+        # quantity and remaining are in lots
+        self.id = order_id
+        self.commodity = commodity
+        self.side = side
+        self.ticks = ticks
+        self.quantity = quantity
+        self.remaining = quantity
+        self.owner = owner
+        self.ts_ns = ts_ns
+        self.status = OPEN
+
+    def to_dict(self, tick_size: float, lot_size: float) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "commodity": self.commodity,
+            "side": self.side,
+            "price": round(self.ticks * tick_size, 10),
+            "quantity": round(self.quantity * lot_size, 10),
+            "remaining": round(self.remaining * lot_size, 10),
+            "owner": self.owner,
+            "ts_ns": self.ts_ns,
+            "status": self.status,
+        }
+
+
+class Trade:
+    __slots__ = ("id", "commodity", "ticks", "quantity", "buy_order_id", "sell_order_id", "aggressor", "ts_ns")
+
+    def __init__(self, trade_id: int, commodity: str, ticks: int, quantity: int, buy_order_id: int, sell_order_id: int, aggressor: str, ts_ns: int):
+        self.id = trade_id
+        self.commodity = commodity
+        self.ticks = ticks
+        self.quantity = quantity
+        self.buy_order_id = buy_order_id
+        self.sell_order_id = sell_order_id
+        self.aggressor = aggressor
+        self.ts_ns = ts_ns
+
+    def to_dict(self, tick_size: float, lot_size: float) -> Dict[str, Any]:
+        return {
+            "type": "trade",
+            "id": self.id,
+            "commodity": self.commodity,
+            "price": round(self.ticks * tick_size, 10),
+            "quantity": round(self.quantity * lot_size, 10),
+            "buy_order_id": self.buy_order_id,
+            "sell_order_id": self.sell_order_id,
+            "aggressor": self.aggressor,
+            "ts_ns": self.ts_ns,
+        }
+
+
+class PriceLevel:
+    """FIFO queue of orders at one price; cancelled orders are skipped lazily."""
+
+    __slots__ = ("ticks", "orders", "volume", "count")
+
+    def __init__(self, ticks: int):
+        self.ticks = ticks
+        self.orders: Deque[Order] = deque()
+        self.volume = 0  # lots
+        self.count = 0
+
+    def front(self) -> Optional[Order]:
+        orders = self.orders
+        while orders and orders[0].status != OPEN:
+            orders.popleft()
+        return orders[0] if orders else None
+
+
+class BookSide:
+    """One side of the book: price -> level map plus a heap of level prices.
+
+    The heap stores prices negated for bids so the best price is always at
+    index 0. New levels cost O(log n); emptied levels are dropped lazily when
+    they reach the top.
+    """
+
+    def __init__(self, side: str):
+        self.side = side
+        self._sign = -1 if side == BUY else 1
+        self.levels: Dict[int, PriceLevel] = {}
+        self._heap: List[int] = []
+
+    def best(self) -> Optional[PriceLevel]:
+        heap = self._heap
+        while heap:
+            level = self.levels.get(heap[0] * self._sign)
+            if level is not None and level.count:
+                return level
+            heapq.heappop(heap)
+            if level is not None:
+                del self.levels[level.ticks]
+        return None
+
+    def add(self, order: Order) -> None:
+        level = self.levels.get(order.ticks)
+        if level is None:
+            level = self.levels[order.ticks] = PriceLevel(order.ticks)
+            heapq.heappush(self._heap, order.ticks * self._sign)
+        level.orders.append(order)
+        level.volume += order.remaining
+        level.count += 1
+
+    def remove(self, order: Order) -> None:
+        """Account for an order leaving its level (fill or cancel); the deque entry goes lazily."""
+        level = self.levels[order.ticks]
+        level.volume -= order.remaining
+        level.count -= 1
+
+    def depth(self, n: int) -> List[Tuple[int, int, int]]:
+        live = [lvl for lvl in self.levels.values() if lvl.count]
+        best = heapq.nsmallest(n, live, key=lambda lvl: lvl.ticks * self._sign)
+        return [(lvl.ticks, lvl.volume, lvl.count) for lvl in best]
+
+
+class OrderBook:
+    """Limit order book for one commodity with price-time priority matching."""
+
+    def __init__(self, commodity: str, tick_size: float = ORDER_TICK_SIZE, lot_size: float = ORDER_LOT_SIZE):
+        self.commodity = commodity
+        self.tick_size = tick_size
+        self.lot_size = lot_size
+        self.bids = BookSide(BUY)
+        self.asks = BookSide(SELL)
+
+    def to_ticks(self, price: float) -> int:
+        ticks = round(price / self.tick_size)
+        if ticks <= 0:
+            raise OrderError("price must be positive")
+        return ticks
+
+    def to_lots(self, quantity: float) -> int:
+        """Whole lots in ``quantity``; unlike prices, quantities are never rounded to fit."""
+        if not (math.isfinite(quantity) and quantity > 0):
+            raise OrderError("quantity must be positive")
+        exact = quantity / self.lot_size
+        lots = round(exact)
+        if lots == 0 or abs(exact - lots) > 1e-6:
+            raise OrderError(f"quantity must be a whole number of lots of {self.lot_size}")
+        return lots
+
+    def match(self, order: Order, trade_ids, now_ns: int) -> List[Trade]:
+        """Cross ``order`` against the opposite side, filling at resting prices."""
+        opposite = self.asks if order.side == BUY else self.bids
+        crosses = (lambda t: t <= order.ticks) if order.side == BUY else (lambda t: t >= order.ticks)
+        trades: List[Trade] = []
+        while order.remaining:
+            level = opposite.best()
+            if level is None or not crosses(level.ticks):
+                break
+            resting = level.front()
+            qty = min(order.remaining, resting.remaining)
+            buy, sell = (order, resting) if order.side == BUY else (resting, order)
+            trades.append(Trade(next(trade_ids), self.commodity, level.ticks, qty, buy.id, sell.id, order.side, now_ns))
+            order.remaining -= qty
+            resting.remaining -= qty
+            level.volume -= qty
+            if not resting.remaining:
+                resting.status = FILLED
+                level.count -= 1
+                level.orders.popleft()
+        if not order.remaining:
+            order.status = FILLED
+        return trades
+
+    def rest(self, order: Order) -> None:
+        (self.bids if order.side == BUY else self.asks).add(order)
+
+    def cancel(self, order: Order) -> None:
+        (self.bids if order.side == BUY else self.asks).remove(order)
+        order.status = CANCELLED
+
+    def best_bid_ask(self) -> Tuple[Optional[float], Optional[float]]:
+        bid, ask = self.bids.best(), self.asks.best()
+        return (
+            bid.ticks * self.tick_size if bid else None,
+            ask.ticks * self.tick_size if ask else None,
+        )
+
+    def depth(self, levels: int = 10) -> Dict[str, Any]:
+        def fmt(rows):
+            return [{"price": round(t * self.tick_size, 10), "quantity": round(v * self.lot_size, 10), "orders": c} for t, v, c in rows]
+
+        return {"commodity": self.commodity, "bids": fmt(self.bids.depth(levels)), "asks": fmt(self.asks.depth(levels))}
+
+
+class MatchingEngine:
+    """Order books per commodity plus a global order index for cancels and lookups."""
+
+    def __init__(self, tick_size: float = ORDER_TICK_SIZE, lot_size: float = ORDER_LOT_SIZE):
+        self.tick_size = tick_size
+        self.lot_size = lot_size
+        self.books: Dict[str, OrderBook] = {}
+        self.orders: Dict[int, Order] = {}
+        self._order_ids = itertools.count(1)
+        self._trade_ids = itertools.count(1)
+
+    def book(self, commodity: str) -> OrderBook:
+        book = self.books.get(commodity)
+        if book is None:
+            book = self.books[commodity] = OrderBook(commodity, self.tick_size, self.lot_size)
+        return book
+
+    def submit(
+        self,
+        commodity: str,
+        side: str,
+        price: float,
+        quantity: float,
+        owner: Optional[str] = None,
+        time_in_force: str = GTC,
+    ) -> Tuple[Order, List[Trade]]:
+        if side not in SIDES:
+            raise OrderError(f"side must be one of {', '.join(SIDES)}")
+        if time_in_force not in TIME_IN_FORCE:
+            raise OrderError(f"time_in_force must be one of {', '.join(TIME_IN_FORCE)}")
+        book = self.book(commodity)
+        ticks, lots = book.to_ticks(price), book.to_lots(quantity)
+        now_ns = time.time_ns()
+        order = Order(next(self._order_ids), commodity, side, ticks, lots, owner, now_ns)
+        trades = book.match(order, self._trade_ids, now_ns)
+        for trade in trades:
+            # Fully filled resting orders no longer need to be addressable
+            for oid in (trade.buy_order_id, trade.sell_order_id):
+                resting = self.orders.get(oid)
+                if resting is not None and resting.status == FILLED:
+                    del self.orders[oid]
+        if order.status == OPEN:
+            if time_in_force == IOC:
+                order.status = CANCELLED
+            else:
+                book.rest(order)
+                self.orders[order.id] = order
+        return order, trades
+
+    def cancel(self, order_id: int) -> Optional[Order]:
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return None
+        self.books[order.commodity].cancel(order)
+        return order
+
+    def get(self, order_id: int) -> Optional[Order]:
+        return self.orders.get(order_id)
@@ -0,0 +1,183 @@
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Number of ticks retained per (country, commodity). Each costs 48 bytes (three 8-byte
+# columns, stored twice), so a full buffer at the default is about 4.8 MB per symbol.
+# Buffers grow by doubling as ticks arrive, so quiet symbols only pay for what they hold
+PRICE_HISTORY_DEPTH = int(os.getenv("PRICE_HISTORY_DEPTH", "100000"))
+# Slots a new buffer starts with before it grows toward PRICE_HISTORY_DEPTH
+_INITIAL_SLOTS = 1024
+
+
+def to_epoch_ns(value: datetime) -> int:
+    """Convert a datetime (naive values are taken as UTC) to epoch nanoseconds."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1_000_000) * 1_000
+
+
+def now_ns() -> int:
+    return to_epoch_ns(datetime.now(timezone.utc))
+
+
+def iso_timestamps(ts_ns: np.ndarray) -> List[str]:
+    """Render an epoch-ns column as the ISO strings /prices has always returned."""
+    return np.datetime_as_string(ts_ns.astype("datetime64[ns]"), unit="us").tolist()
+
+
+class PriceRingBuffer:
+    """Bounded tick history for one symbol.
+
+    Every tick is written twice, at ``i`` and ``i + ring``, so the most recent
+    ``ring`` ticks are always one contiguous slice of the backing arrays. The
+    ring starts small and doubles (copying what it holds) until it reaches
+    ``capacity``; it only wraps after that. Appends are amortized O(1) and
+    every window below is a NumPy view, never a copy.
+    Timestamps must be appended in non-decreasing order. Each tick gets the
+    next per-symbol sequence number, starting at 1.
+    """
+
+    def __init__(self, capacity: int = PRICE_HISTORY_DEPTH):
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._ring = min(capacity, _INITIAL_SLOTS)
+        self._ts = np.zeros(2 * self._ring, dtype=np.int64)
+        self._price = np.zeros(2 * self._ring, dtype=np.float64)
+        self._seq = np.zeros(2 * self._ring, dtype=np.int64)
+        self._head = 0  # next write position in [0, ring)
+        self._size = 0
+        self.last_seq = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _grow(self, needed: int) -> None:
+        """Widen the ring to hold ``needed`` ticks (at most ``capacity``); only called before it wraps."""
+        ring = min(self.capacity, max(2 * self._ring, needed))
+        size = self._size
+        columns = []
+        for col in self.columns():
+            grown = np.zeros(2 * ring, dtype=col.dtype)
+            grown[:size] = grown[ring:ring + size] = col
+            columns.append(grown)
+        self._ts, self._price, self._seq = columns
+        self._ring = ring
+        self._head = size
+
+    def append(self, ts_ns: int, price: float) -> int:
+        """Append a tick and return its sequence number."""
+        if self._size == self._ring < self.capacity:
+            self._grow(self._size + 1)
+        head, ring = self._head, self._ring
+        seq = self.last_seq + 1
+        self._ts[head] = self._ts[head + ring] = ts_ns
+        self._price[head] = self._price[head + ring] = price
+        self._seq[head] = self._seq[head + ring] = seq
+        self._head = (head + 1) % ring
+        if self._size < ring:
+            self._size += 1
+        self.last_seq = seq
+        return seq
+
+    def extend(self, ts_ns: np.ndarray, prices: np.ndarray, seqs: np.ndarray) -> None:
+        """Bulk append of recorded ticks (used to reload history); only the newest ``capacity`` are kept."""
+        n = min(len(ts_ns), self.capacity)
+        if n == 0:
+            return
+        cut = len(ts_ns) - n
+        ts_ns, prices, seqs = ts_ns[cut:], prices[cut:], seqs[cut:]
+        if self._size + n > self._ring < self.capacity:
+            self._grow(self._size + n)
+        ring = self._ring
+        first = min(n, ring - self._head)
+        for lo, hi, dst in ((0, first, self._head), (first, n, 0)):
+            if lo < hi:
+                for col, src in ((self._ts, ts_ns), (self._price, prices), (self._seq, seqs)):
+                    col[dst:dst + hi - lo] = src[lo:hi]
+                    col[dst + ring:dst + ring + hi - lo] = src[lo:hi]
+        self._head = (self._head + n) % ring
+        self._size = min(self._size + n, ring)
+        self.last_seq = int(seqs[-1])
+
+    def _bounds(self) -> Tuple[int, int]:
+        end = self._head if self._size < self._ring else self._head + self._ring
+        return end - self._size, end
+
+    def columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Views of (timestamps, prices, sequence numbers), oldest first."""
+        start, end = self._bounds()
+        return self._ts[start:end], self._price[start:end], self._seq[start:end]
+
+    def last(self) -> Optional[Tuple[int, float, int]]:
+        if not self._size:
+            return None
+        idx = (self._head - 1) % self._ring
+        return int(self._ts[idx]), float(self._price[idx]), int(self._seq[idx])
+
+    def window(
+        self,
+        since_ns: Optional[int] = None,
+        until_ns: Optional[int] = None,
+        last_n: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Views of ticks with ``since_ns <= ts <= until_ns``, trimmed to the newest ``last_n``."""
+        ts, price, seq = self.columns()
+        lo, hi = 0, len(ts)
+        if since_ns is not None:
+            lo = int(np.searchsorted(ts, since_ns, side="left"))
+        if until_ns is not None:
+            hi = int(np.searchsorted(ts, until_ns, side="right"))
+        if last_n is not None:
+            lo = max(lo, hi - last_n)
+        hi = max(lo, hi)
+        return ts[lo:hi], price[lo:hi], seq[lo:hi]
+
+    def after_seq(self, seq: int) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Views of ticks with sequence number above ``seq``.
+
+        Returns None when they can't all be served: some were evicted, or ``seq``
+        is ahead of this buffer (the client saw a different history).
+        """
+        ts, price, seqs = self.columns()
+        if seq == self.last_seq:
+            return ts[:0], price[:0], seqs[:0]
+        if seq > self.last_seq or not len(seqs) or seqs[0] > seq + 1:
+            return None
+        lo = int(np.searchsorted(seqs, seq, side="right"))
+        return ts[lo:], price[lo:], seqs[lo:]
+
+
+class PriceHistory:
+    """Per-symbol ring buffers keyed by ``"COUNTRY:commodity"``."""
+
+    def __init__(self, capacity: int = PRICE_HISTORY_DEPTH):
+        self.capacity = capacity
+        self._buffers: Dict[str, PriceRingBuffer] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._buffers
+
+    def get(self, key: str) -> Optional[PriceRingBuffer]:
+        return self._buffers.get(key)
+
+    def keys(self):
+        return self._buffers.keys()
+
+    def _buffer(self, key: str) -> PriceRingBuffer:
+        buf = self._buffers.get(key)
+        if buf is None:
+            buf = self._buffers[key] = PriceRingBuffer(self.capacity)
+        return buf
+
+    def append(self, key: str, ts_ns: int, price: float) -> int:
+        """Append a tick and return its per-symbol sequence number."""
+        return self._buffer(key).append(ts_ns, price)
+
+    def extend(self, key: str, ts_ns: np.ndarray, prices: np.ndarray, seqs: np.ndarray) -> PriceRingBuffer:
+        buf = self._buffer(key)
+        buf.extend(ts_ns, prices, seqs)
+        return buf
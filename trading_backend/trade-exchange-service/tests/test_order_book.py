@@ -0,0 +1,29 @@
+import pytest
+
+from order_book import BUY, FILLED, OPEN, SELL, MatchingEngine, OrderError
+
+
+def test_fractional_fills_leave_no_dust():
+    engine = MatchingEngine(tick_size=0.01, lot_size=0.001)
+    sell, _ = engine.submit("gold", SELL, 10.0, 0.3)
+    engine.submit("gold", BUY, 10.0, 0.1)
+    _, trades = engine.submit("gold", BUY, 10.0, 0.2)
+    assert [t.quantity for t in trades] == [200]
+    assert sell.status == FILLED and sell.remaining == 0
+
+    # Nothing is left to trade against, so a further buy rests in full
+    order, trades = engine.submit("gold", BUY, 10.0, 0.3)
+    assert trades == []
+    assert order.status == OPEN
+    assert engine.book("gold").depth(5) == {
+        "commodity": "gold",
+        "bids": [{"price": 10.0, "quantity": 0.3, "orders": 1}],
+        "asks": [],
+    }
+
+
+@pytest.mark.parametrize("quantity", [0, -1, 0.0004, 0.0015, float("nan"), float("inf")])
+def test_rejects_sizes_that_are_not_whole_positive_lots(quantity):
+    engine = MatchingEngine(tick_size=0.01, lot_size=0.001)
+    with pytest.raises(OrderError):
+        engine.submit("gold", BUY, 10.0, quantity)
@@ -0,0 +1,41 @@
+import random
+from collections import deque
+
+import numpy as np
+import pytest
+
+from price_history import PriceRingBuffer
+
+
+@pytest.mark.parametrize("capacity", [1, 5, 1024, 3000])
+def test_growing_buffer_keeps_the_newest_ticks(capacity):
+    rng = random.Random(capacity)
+    buf = PriceRingBuffer(capacity)
+    expected = deque(maxlen=capacity)
+    ts = seq = 0
+    for _ in range(300):
+        if rng.random() < 0.2:
+            n = rng.randrange(1, 2 * capacity + 10)
+            new_ts = np.arange(ts + 1, ts + n + 1, dtype=np.int64)
+            new_seq = np.arange(seq + 1, seq + n + 1, dtype=np.int64)
+            buf.extend(new_ts, new_ts.astype(np.float64), new_seq)
+            expected.extend(zip(new_ts.tolist(), new_seq.tolist()))
+            ts, seq = ts + n, seq + n
+        else:
+            for _ in range(rng.randrange(1, 50)):
+                ts += 1
+                seq = buf.append(ts, float(ts))
+                expected.append((ts, seq))
+        got_ts, got_price, got_seq = buf.columns()
+        assert list(zip(got_ts.tolist(), got_seq.tolist())) == list(expected)
+        assert got_price.tolist() == [float(t) for t, _ in expected]
+        assert buf.last() == (expected[-1][0], float(expected[-1][0]), expected[-1][1])
+    assert len(buf) == capacity
+
+
+def test_buffer_allocates_lazily():
+    buf = PriceRingBuffer(100_000)
+    for ts in range(1, 2001):
+        buf.append(ts, 1.0)
+    assert len(buf._ts) < 2 * 100_000
+    assert buf.after_seq(1500)[2].tolist() == list(range(1501, 2001))
@@ -0,0 +1,39 @@
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+from tick_log import TickLog
+
+KEY = "IN:wheat"
+START_NS = int(datetime(2026, 1, 5, tzinfo=timezone.utc).timestamp()) * 1_000_000_000
+
+
+def test_concurrent_reads_do_not_duplicate_or_reorder_rows(tmp_path):
+    log = TickLog(str(tmp_path))
+    n = 150_000
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            log.read(KEY)
+
+    readers = [threading.Thread(target=reader) for _ in range(2)]
+    for t in readers:
+        t.start()
+    try:
+        for i in range(n):
+            log.append(KEY, START_NS + i, 100.0 + i, i + 1)
+            if i % 1000 == 999:
+                log.flush()
+    finally:
+        done.set()
+        for t in readers:
+            t.join()
+    log.flush()
+
+    ts, prices, seqs = log.read(KEY)
+    assert len(ts) == n
+    assert np.all(np.diff(ts) > 0)
+    assert np.array_equal(seqs, np.arange(1, n + 1))
+    log.close()
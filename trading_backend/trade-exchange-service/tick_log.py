@@ -0,0 +1,301 @@
+import logging
+import os
+import shutil
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("trade_exchange.tick_log")
+
+# Empty string disables the on-disk log
+TICK_LOG_DIR = os.getenv("TICK_LOG_DIR", "data/ticks")
+TICK_LOG_RETENTION_DAYS = int(os.getenv("TICK_LOG_RETENTION_DAYS", "90"))
+# Closed daily segments older than this are merged into one segment per month
+TICK_LOG_COMPACT_AFTER_DAYS = int(os.getenv("TICK_LOG_COMPACT_AFTER_DAYS", "7"))
+
+# (file suffix, dtype) per column: timestamp, price, per-symbol sequence number
+COLUMNS = ((".ts.i64", np.int64), (".px.f64", np.float64), (".seq.i64", np.int64))
+TS_SUFFIX = COLUMNS[0][0]
+# Written once a merge's new columns are complete: lists the segments they replace
+MERGE_SUFFIX = ".merge"
+TMP_SUFFIX = ".tmp"
+
+Columns = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _empty() -> Columns:
+    return tuple(np.empty(0, dtype=dtype) for _, dtype in COLUMNS)
+
+
+def _concat(parts: List[Columns]) -> Columns:
+    if not parts:
+        return _empty()
+    if len(parts) == 1:
+        return parts[0]
+    return tuple(np.concatenate(col) for col in zip(*parts))
+
+
+def _day_of(ts_ns: int) -> date:
+    return datetime.fromtimestamp(ts_ns / 1e9, tz=timezone.utc).date()
+
+
+def _epoch_ns(d: date) -> int:
+    return int(datetime(d.year, d.month, d.day, tzinfo=timezone.utc).timestamp()) * 1_000_000_000
+
+
+class Segment:
+    """One set of column files on disk covering a UTC day (``2024-01-05``) or month (``2024-01``)."""
+
+    def __init__(self, directory: str, name: str, suffix: str = ""):
+        self.name = name
+        self.paths = [os.path.join(directory, name + col_suffix + suffix) for col_suffix, _ in COLUMNS]
+        self.ts_path = self.paths[0]
+        if len(name) == 7:
+            first = datetime.strptime(name, "%Y-%m").date()
+            last = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            first = datetime.strptime(name, "%Y-%m-%d").date()
+            last = first + timedelta(days=1)
+        self.first_day = first
+        self.start_ns = _epoch_ns(first)
+        self.end_ns = _epoch_ns(last)
+
+    def __len__(self) -> int:
+        try:
+            return min(os.path.getsize(path) for path in self.paths) // 8
+        except OSError:
+            return 0
+
+    def columns(self) -> Columns:
+        """Read-only memory maps of (timestamps, prices, seqs); pages come from the OS cache."""
+        n = len(self)
+        if n == 0:
+            return _empty()
+        return tuple(np.memmap(path, dtype=dtype, mode="r", shape=(n,)) for path, (_, dtype) in zip(self.paths, COLUMNS))
+
+    def repair(self) -> None:
+        """Truncate a torn tail so every column holds the same number of records."""
+        n = len(self)
+        for path in self.paths:
+            if os.path.exists(path) and os.path.getsize(path) != n * 8:
+                with open(path, "r+b") as f:
+                    f.truncate(n * 8)
+
+    def delete(self) -> None:
+        for path in self.paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class _Writer:
+    def __init__(self, segment: Segment):
+        self.segment = segment
+        self.files = [open(path, "ab") for path in segment.paths]
+        self.rows: List[Tuple[int, float, int]] = []
+
+    def flush(self) -> None:
+        if self.rows:
+            for f, values, (_, dtype) in zip(self.files, zip(*self.rows), COLUMNS):
+                np.asarray(values, dtype=dtype).tofile(f)
+            self.rows.clear()
+        for f in self.files:
+            f.flush()
+
+    def close(self) -> None:
+        self.flush()
+        for f in self.files:
+            f.close()
+
+
+class TickLog:
+    """Append-only columnar tick log, one directory per symbol and one segment per UTC day.
+
+    Appends are buffered in memory and written by ``flush`` (once per feed
+    batch). Reads memory-map the segments overlapping the requested range, so
+    a single-segment read is a zero-copy view of the page cache. Appends
+    come from the event loop while reads and retention run in worker threads,
+    so buffered rows, flushes, segment deletes and renames all go through
+    ``_lock``; a reader flushes and maps segments under it too.
+    """
+
+    def __init__(
+        self,
+        root: str = TICK_LOG_DIR,
+        retention_days: int = TICK_LOG_RETENTION_DAYS,
+        compact_after_days: int = TICK_LOG_COMPACT_AFTER_DAYS,
+    ):
+        self.root = root
+        self.retention_days = retention_days
+        self.compact_after_days = compact_after_days
+        self._writers: Dict[str, _Writer] = {}
+        self._lock = threading.RLock()
+        os.makedirs(root, exist_ok=True)
+        for key in self.keys():
+            self._recover(self._dir(key))
+
+    @staticmethod
+    def _dirname(key: str) -> str:
+        return key.replace(":", "_", 1)
+
+    def _dir(self, key: str) -> str:
+        return os.path.join(self.root, self._dirname(key))
+
+    def keys(self) -> List[str]:
+        return [name.replace("_", ":", 1) for name in sorted(os.listdir(self.root)) if os.path.isdir(os.path.join(self.root, name))]
+
+    def segments(self, key: str) -> List[Segment]:
+        directory = self._dir(key)
+        if not os.path.isdir(directory):
+            return []
+        names = {f[: -len(TS_SUFFIX)] for f in os.listdir(directory) if f.endswith(TS_SUFFIX)}
+        return sorted((Segment(directory, n) for n in names), key=lambda s: s.start_ns)
+
+    def append(self, key: str, ts_ns: int, price: float, seq: int) -> None:
+        with self._lock:
+            writer = self._writers.get(key)
+            if writer is None or not writer.segment.start_ns <= ts_ns < writer.segment.end_ns:
+                writer = self._open_writer(key, ts_ns)
+            writer.rows.append((ts_ns, price, seq))
+
+    def _open_writer(self, key: str, ts_ns: int) -> _Writer:
+        old = self._writers.pop(key, None)
+        if old is not None:
+            old.close()
+        directory = self._dir(key)
+        os.makedirs(directory, exist_ok=True)
+        segment = Segment(directory, _day_of(ts_ns).isoformat())
+        segment.repair()
+        writer = self._writers[key] = _Writer(segment)
+        return writer
+
+    def flush(self) -> None:
+        with self._lock:
+            for writer in self._writers.values():
+                writer.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            for writer in self._writers.values():
+                writer.close()
+            self._writers.clear()
+
+    def read(self, key: str, since_ns: Optional[int] = None, until_ns: Optional[int] = None) -> Columns:
+        """Ticks with ``since_ns <= ts <= until_ns``; a view when one segment covers the range."""
+        with self._lock:
+            writer = self._writers.get(key)
+            if writer is not None:
+                writer.flush()
+            mapped = []
+            for segment in self.segments(key):
+                if since_ns is not None and segment.end_ns <= since_ns:
+                    continue
+                if until_ns is not None and segment.start_ns > until_ns:
+                    break
+                mapped.append(segment.columns())
+        parts = []
+        for cols in mapped:
+            ts = cols[0]
+            lo = int(np.searchsorted(ts, since_ns, side="left")) if since_ns is not None else 0
+            hi = int(np.searchsorted(ts, until_ns, side="right")) if until_ns is not None else len(ts)
+            if lo < hi:
+                parts.append(tuple(col[lo:hi] for col in cols))
+        return _concat(parts)
+
+    def tail(self, key: str, n: int) -> Columns:
+        """The newest ``n`` ticks, reading only as many segments (newest first) as needed."""
+        parts = []
+        remaining = n
+        with self._lock:
+            for segment in reversed(self.segments(key)):
+                segment.repair()
+                cols = segment.columns()
+                take = min(remaining, len(cols[0]))
+                if take:
+                    parts.append(tuple(col[len(col) - take:] for col in cols))
+                    remaining -= take
+                if remaining == 0:
+                    break
+        parts.reverse()
+        return _concat(parts)
+
+    def enforce_retention(self, today: Optional[date] = None) -> None:
+        """Drop segments past retention and merge old daily segments into monthly ones."""
+        today = today or datetime.now(timezone.utc).date()
+        expire_before = _epoch_ns(today - timedelta(days=self.retention_days))
+        compact_before = _epoch_ns(today - timedelta(days=self.compact_after_days))
+        for key in self.keys():
+            by_month: Dict[str, List[Segment]] = {}
+            for segment in self.segments(key):
+                if segment.end_ns <= expire_before:
+                    logger.info("Dropping expired tick segment %s/%s", key, segment.name)
+                    with self._lock:
+                        segment.delete()
+                elif segment.end_ns <= compact_before:
+                    by_month.setdefault(segment.first_day.strftime("%Y-%m"), []).append(segment)
+            for month, segments in by_month.items():
+                if len(segments) > 1 or len(segments[0].name) != 7:
+                    self._merge(key, month, segments)
+
+    def _merge(self, key: str, month: str, segments: List[Segment]) -> None:
+        """Copy ``segments`` into new ``month`` columns, then swap them in.
+
+        The manifest written once the copies are synced is the commit point:
+        a crash before it leaves the sources untouched (and ``_recover``
+        drops the partial copies), a crash after it is rolled forward.
+        """
+        directory = self._dir(key)
+        target = Segment(directory, month)
+        if os.path.exists(target.ts_path) and all(s.name != month for s in segments):
+            # Append to the month already compacted earlier
+            segments = [target] + segments
+        tmp = Segment(directory, month, suffix=TMP_SUFFIX)
+        for segment in segments:
+            segment.repair()
+        for i, tmp_path in enumerate(tmp.paths):
+            with open(tmp_path, "wb") as out:
+                for segment in segments:
+                    with open(segment.paths[i], "rb") as f:
+                        shutil.copyfileobj(f, out)
+                out.flush()
+                os.fsync(out.fileno())
+        manifest = os.path.join(directory, month + MERGE_SUFFIX)
+        with open(manifest + TMP_SUFFIX, "w") as f:
+            f.write("\n".join(segment.name for segment in segments))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(manifest + TMP_SUFFIX, manifest)
+        with self._lock:
+            self._finish_merge(directory, month)
+        logger.info("Compacted %d tick segments into %s/%s", len(segments), key, month)
+
+    @staticmethod
+    def _finish_merge(directory: str, month: str) -> None:
+        """Move a committed merge's columns into place, then drop the segments they replace."""
+        manifest = os.path.join(directory, month + MERGE_SUFFIX)
+        with open(manifest) as f:
+            sources = f.read().split()
+        tmp = Segment(directory, month, suffix=TMP_SUFFIX)
+        for tmp_path, path in zip(tmp.paths, Segment(directory, month).paths):
+            if os.path.exists(tmp_path):
+                os.replace(tmp_path, path)
+        for name in sources:
+            if name != month:
+                Segment(directory, name).delete()
+        os.remove(manifest)
+
+    def _recover(self, directory: str) -> None:
+        """Finish merges committed before a crash and drop the partial copies of uncommitted ones."""
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(MERGE_SUFFIX):
+                logger.warning("Finishing interrupted tick compaction %s/%s", directory, name)
+                self._finish_merge(directory, name[: -len(MERGE_SUFFIX)])
+        for name in os.listdir(directory):
+            if name.endswith(TMP_SUFFIX):
+                logger.warning("Removing partial tick compaction file %s/%s", directory, name)
+                os.remove(os.path.join(directory, name))
+
+
+def tick_log_from_env() -> Optional[TickLog]:
+    return TickLog() if TICK_LOG_DIR else None